@@ -0,0 +1,215 @@
+"""
+Benchmarks every generation stage across board sizes with fixed seeds.
+
+Usage:
+    python benchmark.py [--sizes 4 6 8 10 12 14] [--samples 30] [--seed 0]
+                        [--output results.json] [--compare baseline.json] [--tolerance 0.2]
+
+Stages:
+    valid_rows                                Enumerating the valid rows (bypassing their caches).
+    completed_board                           generate_full_board.generate_completed_board.
+    check_unique                              check_unique._generate_game_board,
+    generate_sparse_gameboard                 generate_sparse_gameboard._generate_game_board and
+    generate_gameboard_slow_and_ineffective   generate_gameboard_slow_and_ineffective._generate_game_board,
+                                              all fed the same completed boards.
+
+Every case reports puzzles (calls) per second, p50/p99 latency, the peak resident
+memory of a fresh process that runs the stage once (so that numba's allocations,
+its loaded kernels and the stage's tables count, and no other case's), and the mean
+number of restarts (completed_board only). With --compare, cases whose p50 or
+p99 latency grew by more than --tolerance relative to the baseline are listed and the
+exit status is 1, so the script can gate a deploy.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import numba
+from typing import Callable, Dict, List, Optional, Tuple  # For type hints
+import check_unique
+import generate_sparse_gameboard
+import generate_gameboard_slow_and_ineffective
+from generate_full_board import (_enumerate_valid_row_masks, masks_to_rows,
+                                 generate_completed_board_with_stats, seed_numba_random)
+
+BENCHMARK_FORMAT_VERSION = 2
+GAME_BOARD_VARIANTS = {
+    "check_unique": check_unique._generate_game_board,
+    "generate_sparse_gameboard": generate_sparse_gameboard._generate_game_board,
+    "generate_gameboard_slow_and_ineffective": generate_gameboard_slow_and_ineffective._generate_game_board,
+}
+STAGES = ("valid_rows", "completed_board") + tuple(GAME_BOARD_VARIANTS)
+
+
+def _seed_everything(seed: int) -> np.random.Generator:
+    """Seeds NumPy's global state, numba's global state, and returns a fresh Generator."""
+    np.random.seed(seed)
+    seed_numba_random(seed)
+    return np.random.default_rng(seed)
+
+
+def _time_calls(call: Callable[[int], int], samples: int) -> Tuple[np.ndarray, int]:
+    """
+    Times `call(i)` for i in range(samples), after one untimed call that absorbs
+    compilation and cache loading.
+
+    Returns:
+        Tuple[np.ndarray, int]: The latencies in seconds, and the sum of what `call` returned.
+    """
+    call(0)
+    latencies = np.empty(samples)
+    total = 0
+    for i in range(samples):
+        start = time.perf_counter()
+        total += call(i)
+        latencies[i] = time.perf_counter() - start
+    return latencies, total
+
+
+_MEMORY_PROBE = """
+import resource, sys
+import benchmark
+benchmark._stage_call({stage!r}, {n}, 1, {seed})(0)
+max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(max_rss if sys.platform == "darwin" else 1024 * max_rss)  # Bytes on macOS, KiB elsewhere.
+"""
+
+
+def _stage_call(stage: str, n: int, samples: int, seed: int) -> Callable[[int], int]:
+    """
+    The call that benchmarks `stage` on its i-th sample, for i in range(samples),
+    returning the number of restarts (completed_board) or 0.
+    """
+    if stage == "valid_rows":
+        def call(i: int) -> int:
+            masks_to_rows(_enumerate_valid_row_masks(n), n)
+            return 0
+    elif stage == "completed_board":
+        rng = _seed_everything(seed)
+
+        def call(i: int) -> int:
+            return generate_completed_board_with_stats(n, rng=rng)[1].restarts
+    else:
+        # Every variant removes clues from the same completed boards.
+        rng = _seed_everything(seed)
+        solutions = [generate_completed_board_with_stats(n, rng=rng)[0] for _ in range(samples)]
+        generate_game_board = GAME_BOARD_VARIANTS[stage]
+
+        def call(i: int) -> int:
+            generate_game_board(solutions[i].copy())
+            return 0
+    return call
+
+
+def measure_peak_memory(stage: str, n: int, seed: int) -> int:
+    """
+    The peak resident memory, in bytes, of a fresh process that sets up `stage` and
+    calls it once, loading its kernels from the numba cache (where they are cached).
+    """
+    probe = _MEMORY_PROBE.format(stage=stage, n=n, seed=seed)
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return int(output.strip().splitlines()[-1])
+
+
+def benchmark_case(stage: str, n: int, samples: int, seed: int) -> dict:
+    """Benchmarks one stage at one board size."""
+    restarts = None
+    call = _stage_call(stage, n, samples, seed)
+    _seed_everything(seed)
+    latencies, total_restarts = _time_calls(call, samples)
+    if stage == "completed_board":
+        restarts = total_restarts / samples
+    return {
+        "stage": stage,
+        "n": n,
+        "samples": samples,
+        "puzzles_per_second": samples / latencies.sum(),
+        "p50_seconds": float(np.percentile(latencies, 50)),
+        "p99_seconds": float(np.percentile(latencies, 99)),
+        "peak_rss_bytes": measure_peak_memory(stage, n, seed),
+        "mean_restarts": restarts,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: List[int], samples: int, seed: int, stages=STAGES) -> dict:
+    """Runs every stage at every size, returning the results with enough metadata to compare runs."""
+    results = []
+    for stage in stages:
+        for n in sizes:
+            results.append(benchmark_case(stage, n, samples, seed))
+            print(_format_result(results[-1]), file=sys.stderr)
+    return {
+        "format_version": BENCHMARK_FORMAT_VERSION,
+        "timestamp": time.time(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def _format_result(result: dict) -> str:
+    restarts = "" if result["mean_restarts"] is None else f", {result['mean_restarts']:.2f} restarts"
+    return (f"{result['stage']:>40} n={result['n']:<2}: {result['puzzles_per_second']:10.1f}/s, "
+            f"p50 {1e3 * result['p50_seconds']:8.3f}ms, p99 {1e3 * result['p99_seconds']:8.3f}ms, "
+            f"peak RSS {result['peak_rss_bytes'] / 2 ** 20:6.1f}MiB{restarts}")
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """
+    The cases present in both runs whose p50 or p99 latency grew by more than
+    `tolerance` (a fraction) relative to the baseline.
+    """
+    baseline_results: Dict[Tuple[str, int], dict] = {(r["stage"], r["n"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = baseline_results.get((result["stage"], result["n"]))
+        if old is None:
+            continue
+        for key in ("p50_seconds", "p99_seconds"):
+            ratio = result[key] / old[key]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{result['stage']} n={result['n']}: {key} {1e3 * old[key]:.3f}ms -> "
+                                   f"{1e3 * result[key]:.3f}ms ({ratio:.2f}x)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 6, 8, 10, 12, 14])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--samples", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="a previous --output file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="the allowed relative latency increase over the baseline")
+    args = parser.parse_args()
+    run = run_benchmarks(args.sizes, args.samples, args.seed, args.stages)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), run, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
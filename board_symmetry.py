@@ -0,0 +1,163 @@
+import numpy as np
+from numba import prange, uint8, uint64, int_, types
+from lazy_jit import lazy_njit
+
+# The 16 symmetries of a board: the 8 dihedral transforms combined with the 1 <-> 2
+# color swap, none of which changes the rules. Transform t is applied as
+#   if t & 1: transpose,
+#   if t & 2: reverse the row order,
+#   if t & 4: reverse the column order,
+#   if t & 8: swap the colors,
+# in that order. Blank cells (0) stay blank.
+# A board is canonicalized by packing every row of every transform into a uint64,
+# 2 bits per cell (like the row masks of generate_full_board, with room for blanks),
+# and keeping the transform whose rows are lexicographically smallest.
+N_TRANSFORMS = 16
+MAX_CANONICAL_N = 32
+
+_HASH_MULTIPLIER_1 = np.uint64(0xBF58476D1CE4E5B9)
+_HASH_MULTIPLIER_2 = np.uint64(0x94D049BB133111EB)
+_HASH_INCREMENT = np.uint64(0x9E3779B97F4A7C15)
+
+
+def transform_board(board: np.ndarray, transform: int) -> np.ndarray:
+    """Applies symmetry `transform` (see above) to an n x n board."""
+    if transform & 1:
+        board = board.T
+    if transform & 2:
+        board = board[::-1]
+    if transform & 4:
+        board = board[:, ::-1]
+    if transform & 8:
+        board = np.where(board > 0, 3 - board, 0)
+    return np.ascontiguousarray(board, dtype=np.uint8)
+
+
+def distinct_variants(board: np.ndarray) -> np.ndarray:
+    """
+    The distinct boards among the 16 symmetries of `board`, as a (V, n, n) stack
+    starting with `board` itself. Every variant of a valid board is valid.
+    """
+    variants = np.stack([transform_board(board, t) for t in range(N_TRANSFORMS)])
+    first_indices = np.unique(variants.reshape(N_TRANSFORMS, -1), axis=0, return_index=True)[1]
+    return variants[np.sort(first_indices)]
+
+
+@lazy_njit(uint64(uint8[:, :], int_, int_), cache=True)
+def _transformed_row_code(board: np.ndarray, transform: int, i: int) -> np.uint64:
+    """Row i of transform_board(board, transform), packed 2 bits per cell."""
+    n = board.shape[0]
+    code = np.uint64(0)
+    for j in range(n):
+        x = n - 1 - i if transform & 2 else i
+        y = n - 1 - j if transform & 4 else j
+        cell = board[y, x] if transform & 1 else board[x, y]
+        if transform & 8 and cell:
+            cell = 3 - cell
+        code |= np.uint64(cell) << np.uint64(2 * j)
+    return code
+
+
+@lazy_njit(types.Tuple((uint64[:, :], uint8[:]))(uint8[:, :, :]), parallel=True, cache=True)
+def canonical_rows(boards: np.ndarray) -> tuple:
+    """
+    The canonical form of each board of a (B, n, n) stack, as packed rows.
+
+    Two boards have equal canonical rows if and only if one is a symmetry of the other.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (B, n) uint64 packed rows of the canonical
+                                       forms, and the transform (uint8) that maps each
+                                       board to its canonical form.
+    """
+    n_boards, n = boards.shape[:2]
+    rows = np.empty((n_boards, n), dtype=np.uint64)
+    transforms = np.zeros(n_boards, dtype=np.uint8)
+    for b in prange(n_boards):
+        board = boards[b]
+        best = rows[b]
+        for i in range(n):
+            best[i] = _transformed_row_code(board, 0, i)
+        for transform in range(1, N_TRANSFORMS):
+            smaller = False
+            for i in range(n):
+                code = _transformed_row_code(board, transform, i)
+                if not smaller:
+                    if code > best[i]:
+                        break
+                    smaller = code < best[i]
+                if smaller:
+                    best[i] = code
+            if smaller:
+                transforms[b] = transform
+    return rows, transforms
+
+
+@lazy_njit(uint64[:](uint64[:, :]), cache=True)
+def hash_rows(rows: np.ndarray) -> np.ndarray:
+    """A 64-bit hash (splitmix64, folded over the rows) of each row of a (B, n) array."""
+    n_boards, n = rows.shape
+    hashes = np.empty(n_boards, dtype=np.uint64)
+    for b in range(n_boards):
+        h = np.uint64(n)
+        for i in range(n):
+            h = (h ^ rows[b, i]) + _HASH_INCREMENT
+            h = (h ^ (h >> np.uint64(30))) * _HASH_MULTIPLIER_1
+            h = (h ^ (h >> np.uint64(27))) * _HASH_MULTIPLIER_2
+            h = h ^ (h >> np.uint64(31))
+        hashes[b] = h
+    return hashes
+
+
+def _as_stack(boards: np.ndarray) -> np.ndarray:
+    boards = np.ascontiguousarray(boards, dtype=np.uint8)
+    if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+        raise ValueError("boards must be a (B, n, n) stack")
+    if boards.shape[1] > MAX_CANONICAL_N:
+        raise ValueError(f"Boards larger than {MAX_CANONICAL_N}x{MAX_CANONICAL_N} are not supported")
+    return boards
+
+
+def canonical_hashes(boards: np.ndarray) -> np.ndarray:
+    """
+    A 64-bit hash of each board of a (B, n, n) stack that is the same for all 16
+    symmetries of a board.
+    """
+    return hash_rows(canonical_rows(_as_stack(boards))[0])
+
+
+def canonical_boards(boards: np.ndarray) -> np.ndarray:
+    """The canonical form of each board of a (B, n, n) stack."""
+    boards = _as_stack(boards)
+    transforms = canonical_rows(boards)[1]
+    return np.stack([transform_board(board, t) for board, t in zip(boards, transforms)]) if len(boards) \
+        else boards.copy()
+
+
+def unique_indices(boards: np.ndarray) -> np.ndarray:
+    """
+    The (sorted) indices of the first board of each symmetry class in a (B, n, n) stack.
+
+    Boards are compared by their full canonical forms, so hash collisions cannot
+    merge distinct puzzles.
+    """
+    rows = canonical_rows(_as_stack(boards))[0]
+    keys = np.ascontiguousarray(rows).view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1])))
+    return np.sort(np.unique(keys.ravel(), return_index=True)[1])
+
+
+if __name__ == "__main__":
+    import time
+    from generate_gameboard_batch import generate_game_boards
+    boards = generate_game_boards(10, 2000, workers=1, seed=0)
+    rng = np.random.default_rng(0)
+    symmetric = np.stack([transform_board(board, t) for board, t in
+                          zip(boards, rng.integers(N_TRANSFORMS, size=len(boards)))])
+    assert np.array_equal(canonical_hashes(boards), canonical_hashes(symmetric))
+    stack = np.concatenate([boards, symmetric] * 250)
+    canonical_hashes(stack[:1])
+    start_time = time.perf_counter()
+    unique = unique_indices(stack)
+    elapsed = time.perf_counter() - start_time
+    print(f"Deduplicated {len(stack)} 10x10 puzzles to {len(unique)} in {elapsed:.2f}s "
+          f"({60 * len(stack) / elapsed / 1e6:.1f} million per minute)")
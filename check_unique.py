@@ -1,10 +1,13 @@
 import numpy as np
-from numba import njit, bool_, uint8, int_
-from generate_full_board import vec_has_three_in_row, generate_completed_board
-from collections import defaultdict
+from typing import Optional  # For type hints
+import functools  # For @functools.cache
+from numba import bool_, uint8, int_, int64
+from lazy_jit import lazy_njit
+from generate_full_board import vec_has_three_in_row, generate_completed_board, generate_valid_row_masks
+from generation_stats import new_counters, count, REMOVAL_ITERATIONS, RULE_CHECKS, RESCANS
 
 
-@njit(bool_(uint8[:, :], int_, int_), cache=True)
+@lazy_njit(bool_(uint8[:, :], int_, int_), cache=True)
 def rules_2_and_3_check_on_row_for_specific_color(board: np.ndarray, x: int, color: int) -> bool:
     n = board.shape[1]
     max_colors_val = n // 2
@@ -22,92 +25,254 @@ def rules_2_and_3_check_on_row_for_specific_color(board: np.ndarray, x: int, col
     return True
 
 
-@njit(bool_(uint8[:, :], int_), cache=True)
+@lazy_njit(bool_(uint8[:, :], int_), cache=True)
 def rules_2_and_3_check_on_row_for_both_colors(board: np.ndarray, x: int) -> bool:
     return (rules_2_and_3_check_on_row_for_specific_color(board, x, 1) and
             rules_2_and_3_check_on_row_for_specific_color(board, x, 2))
 
 
-@njit(uint8[:, :](uint8[:, :]), cache=False)
-def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
-    d = full_board.shape[1]
-    n_elements = full_board.size
-    flat_coords = np.arange(n_elements)
-    np.random.shuffle(flat_coords)
-    xs, ys = np.divmod(flat_coords, d)
-    partial_board = full_board.copy()
-    i = 0
+@functools.cache
+def distance_rings(n: int) -> tuple:
+    """
+    The offsets (dx, dy) between two cells of an n x n board, grouped into rings of
+    equal squared distance dx**2 + dy**2, from the farthest ring to the nearest.
 
-    while i < n_elements:
-        x = xs[i]
-        y = ys[i]
-        i += 1
-        true_color = partial_board[x, y]
-        if not true_color:
-            continue
-        new_color = 3 - true_color
-        partial_board[x, y] = new_color
-
-        if (not rules_2_and_3_check_on_row_for_both_colors(partial_board, x)
-                or not rules_2_and_3_check_on_row_for_both_colors(partial_board.T, y)
-                or vec_has_three_in_row(partial_board[x - 2:x + 2, y])
-                or vec_has_three_in_row(partial_board[x, y - 2:y + 2])):
-            partial_board[x, y] = 0
-            i = 0
-            continue
-        else:
-            partial_board[x, y] = true_color
+    This function is cached using @functools.cache to memoize results for a given 'n'.
 
-    return partial_board
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (K, 2) int64 offsets, ring by ring, and the
+                                       int64 start of each ring in them, followed by K.
+    """
+    dx, dy = np.divmod(np.arange((2 * n - 1) ** 2), 2 * n - 1)
+    offsets = np.stack([dx - (n - 1), dy - (n - 1)], axis=1).astype(np.int64)
+    squared_distances = np.sum(np.square(offsets), axis=1)
+    order = np.argsort(-squared_distances, kind="stable")
+    offsets = np.ascontiguousarray(offsets[order])
+    squared_distances = squared_distances[order]
+    ring_starts = np.flatnonzero(np.diff(squared_distances, prepend=-1)).astype(np.int64)
+    return offsets, np.append(ring_starts, len(offsets))
 
 
-def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
+@lazy_njit(uint8[:, :](uint8[:, :], int64[:, :], int64[:], int64[:]), cache=True)
+def _remove_farthest_first(full_board: np.ndarray, offsets: np.ndarray, ring_starts: np.ndarray,
+                           counters: np.ndarray) -> np.ndarray:
+    """
+    Blanks a random cell, then repeatedly blanks the cell whose color is forced by the
+    rules (the other color would break one), trying the remaining cells from the
+    farthest to the nearest from the last blanked cell, in random order within each
+    ring of equal distance (see `distance_rings`). Stops once no cell can be blanked.
+    """
     d = full_board.shape[1]
-    n_elements = full_board.size
-    flat_coords = np.arange(n_elements)
-    xs, ys = np.divmod(flat_coords, d)
-    init_coord = np.random.choice(flat_coords)
-    init_x = xs[init_coord]
-    init_y = ys[init_coord]
-    last_removed_pair = (init_x, init_y)
-
     partial_board = full_board.copy()
-    partial_board[last_removed_pair] = 0  # Kickoff the deletion process
-    coord_remaining = set(zip(xs, ys))
-    coord_remaining.remove(last_removed_pair)
-    coords_currently_remaining = coord_remaining.copy()
-
-    while len(coords_currently_remaining) > 0:
-        coord_dict = defaultdict(list)
-        for pair in coords_currently_remaining:
-            distance = np.sum(np.square(np.subtract(last_removed_pair,
-                                                    pair)))
-            coord_dict[distance].append(pair)
-        distances = sorted(coord_dict.keys())
-        while len(distances) > 0:
-            distance = distances.pop()
-            nearby_coords = coord_dict[distance]
-            np.random.shuffle(nearby_coords)
-            for (x, y) in nearby_coords:
+    ring_cells = np.empty(full_board.size, dtype=np.int64)
+    last_x, last_y = np.divmod(np.random.randint(full_board.size), d)
+    partial_board[last_x, last_y] = 0  # Kickoff the deletion process
+    removed = True
+    while removed:
+        removed = False
+        for ring in range(len(ring_starts) - 1):
+            n_ring_cells = 0
+            for k in range(ring_starts[ring], ring_starts[ring + 1]):
+                x = last_x + offsets[k, 0]
+                y = last_y + offsets[k, 1]
+                if 0 <= x < full_board.shape[0] and 0 <= y < d and partial_board[x, y]:
+                    ring_cells[n_ring_cells] = x * d + y
+                    n_ring_cells += 1
+            np.random.shuffle(ring_cells[:n_ring_cells])
+            for cell in ring_cells[:n_ring_cells]:
+                count(counters, REMOVAL_ITERATIONS, 1)
+                count(counters, RULE_CHECKS, 1)
+                x, y = np.divmod(cell, d)
                 true_color = partial_board[x, y]
-                new_color = 3 - true_color
-                partial_board[x, y] = new_color
-                if (not rules_2_and_3_check_on_row_for_both_colors(
-                        partial_board, x)
-                        or not rules_2_and_3_check_on_row_for_both_colors(
-                            partial_board.T, y)
+                partial_board[x, y] = 3 - true_color
+                if (not rules_2_and_3_check_on_row_for_both_colors(partial_board, x)
+                        or not rules_2_and_3_check_on_row_for_both_colors(partial_board.T, y)
                         or vec_has_three_in_row(partial_board[x - 2:x + 2, y])
-                        or vec_has_three_in_row(
-                            partial_board[x, y - 2:y + 2])):
+                        or vec_has_three_in_row(partial_board[x, y - 2:y + 2])):
                     partial_board[x, y] = 0
-                    last_removed_pair = (x, y)
-                    coord_remaining.remove(last_removed_pair)
-                    coords_currently_remaining = coord_remaining.copy()
-                    distances = []
+                    last_x, last_y = x, y
+                    removed = True
+                    count(counters, RESCANS, 1)
                     break
-                else:
-                    partial_board[x, y] = true_color
-                    coords_currently_remaining.remove((x, y))
+                partial_board[x, y] = true_color
+            if removed:
+                break
+    return partial_board
+
+
+def _generate_game_board_counted(full_board: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """_generate_game_board, maintaining the generation_stats counters in `counters`."""
+    return _remove_farthest_first(full_board, *distance_rings(full_board.shape[0]), counters)
+
+
+def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
+    return _generate_game_board_counted(full_board, new_counters(enabled=False))
+
+
+@lazy_njit(int_(uint8[:, :], int64[:]), cache=True)
+def _propagate(board: np.ndarray, row_masks: np.ndarray) -> int:
+    """
+    Fills in every cell forced by the three rules, in place.
+
+    Each row and column is matched against the valid row masks consistent with its
+    filled cells and distinct from every completed line of the same orientation;
+    cells on which all remaining candidates agree are then filled. This repeats
+    until nothing changes.
+
+    Returns:
+        int: -1 if some line has no candidate left, 1 if the board is complete,
+             0 otherwise.
+    """
+    n = board.shape[0]
+    full = (np.int64(1) << n) - 1
+    known = np.zeros(n, dtype=np.int64)
+    values = np.zeros(n, dtype=np.int64)
+    changed = True
+    while changed:
+        changed = False
+        for orientation in range(2):
+            lines = board if orientation == 0 else board.T
+            for i in range(n):
+                known[i] = 0
+                values[i] = 0
+                for j in range(n):
+                    if lines[i, j]:
+                        known[i] |= np.int64(1) << j
+                        if lines[i, j] == 2:
+                            values[i] |= np.int64(1) << j
+            for i in range(n):
+                agree_twos = full
+                agree_ones = full
+                n_candidates = 0
+                for mask in row_masks:
+                    if (mask ^ values[i]) & known[i]:
+                        continue
+                    duplicate = False
+                    for k in range(n):
+                        if k != i and known[k] == full and values[k] == mask:
+                            duplicate = True
+                            break
+                    if duplicate:
+                        continue
+                    n_candidates += 1
+                    agree_twos &= mask
+                    agree_ones &= ~mask
+                if not n_candidates:
+                    return -1
+                forced = (agree_twos | agree_ones) & full & ~known[i]
+                if not forced:
+                    continue
+                changed = True
+                for j in range(n):
+                    if (forced >> j) & 1:
+                        lines[i, j] = 1 + ((agree_twos >> j) & 1)
+                known[i] |= forced
+                values[i] |= agree_twos & forced
+    for val in board.flat:
+        if not val:
+            return 0
+    return 1
+
+
+@lazy_njit(int_(uint8[:, :], int64[:], int_), cache=True)
+def _count_solutions(partial_board: np.ndarray, row_masks: np.ndarray, cap: int) -> int:
+    n = partial_board.shape[0]
+    # Depth-first search over an explicit stack of boards: the top frame is refined
+    # by propagation, and branching pushes a copy with the blank set to 2 while the
+    # frame underneath keeps the alternative 1.
+    stack = np.empty((n * n + 1, n, n), dtype=np.uint8)
+    stack[0] = partial_board
+    top = 0
+    n_solutions = 0
+    while top >= 0:
+        board = stack[top]
+        status = _propagate(board, row_masks)
+        if status < 0:
+            top -= 1
+            continue
+        if status > 0:
+            n_solutions += 1
+            if n_solutions >= cap:
+                return n_solutions
+            top -= 1
+            continue
+        # Branch on the first blank cell of the row with the fewest blanks.
+        best_x = -1
+        best_blanks = n + 1
+        for x in range(n):
+            blanks = 0
+            for y in range(n):
+                if not board[x, y]:
+                    blanks += 1
+            if 0 < blanks < best_blanks:
+                best_x = x
+                best_blanks = blanks
+        best_y = 0
+        while board[best_x, best_y]:
+            best_y += 1
+        stack[top + 1] = board
+        board[best_x, best_y] = 1
+        stack[top + 1, best_x, best_y] = 2
+        top += 1
+    return n_solutions
+
+
+def count_solutions(partial_board: np.ndarray, cap: int = 2) -> int:
+    """
+    Counts the completions of a partial board that satisfy all three rules,
+    stopping as soon as `cap` of them have been found.
+
+    Args:
+        partial_board (np.ndarray): An n x n uint8 board, with 0 for blank cells.
+        cap (int): The count at which to stop searching. The default of 2 is
+                   enough to tell whether a puzzle has a unique solution.
+
+    Returns:
+        int: The number of solutions, or `cap` if there are at least that many.
+    """
+    n = partial_board.shape[0]
+    return _count_solutions(np.ascontiguousarray(partial_board, dtype=np.uint8),
+                            generate_valid_row_masks(n), cap)
+
+
+def has_unique_solution(partial_board: np.ndarray) -> bool:
+    return count_solutions(partial_board, cap=2) == 1
+
+
+@lazy_njit(int_(uint8[:, :], int64[:], int_), cache=True)
+def _blank_while_unique(partial_board: np.ndarray, row_masks: np.ndarray, target_clues: int) -> int:
+    """
+    Blanks the clues of a uniquely solvable puzzle in random order, in place,
+    skipping those whose removal would admit a second solution, until only
+    `target_clues` remain or no clue can be removed.
+
+    Returns:
+        int: The number of clues left.
+    """
+    n = partial_board.shape[0]
+    clues = np.flatnonzero(partial_board)
+    np.random.shuffle(clues)
+    n_clues = clues.shape[0]
+    for clue in clues:
+        if n_clues <= target_clues:
+            break
+        x, y = np.divmod(clue, n)
+        true_color = partial_board[x, y]
+        partial_board[x, y] = 0
+        if _count_solutions(partial_board, row_masks, 2) == 1:
+            n_clues -= 1
+        else:
+            partial_board[x, y] = true_color
+    return n_clues
+
+
+def blank_while_unique(partial_board: np.ndarray, target_clues: int = 0) -> np.ndarray:
+    """
+    A copy of a uniquely solvable puzzle with clues blanked in random order, as long
+    as the solution stays unique, until at most `target_clues` remain (if possible).
+    """
+    partial_board = np.array(partial_board, dtype=np.uint8)
+    _blank_while_unique(partial_board, generate_valid_row_masks(partial_board.shape[0]), target_clues)
     return partial_board
 
 
@@ -115,23 +280,59 @@ def filled_fraction(partial_board: np.array) -> float:
     return np.divide(np.count_nonzero(partial_board), partial_board.size)
 
 
-def generate_game_board(n: int) -> np.array:
+def generate_game_board(n: int, stats: bool = False, seed: Optional[int] = None):
+    """
+    Generates an n x n puzzle, retrying until at most a third of the cells are given,
+    as a deterministic function of `seed` if one is given.
+
+    With stats=True, returns the puzzle together with a GenerationStats, whose
+    `attempts` counts the tries.
+    """
     # return _generate_game_board(generate_completed_board(n))
-    candidate_board = np.ones((1,1), dtype=np.uint8)
-    i = 0
-    while True:
-        if filled_fraction(candidate_board) <= 1/3:
-            print(f"Phew, that took {i} tries!")
-            return candidate_board
-        completed_board = generate_completed_board(n)
-        candidate_board = _generate_game_board(completed_board)
-        i += 1
+    from removal_strategies import generate_with_remover  # removal_strategies imports this module.
+    return generate_with_remover(n, _generate_game_board_counted, stats, seed, max_filled_fraction=1/3)
 
 
 if __name__ == "__main__":
+    import itertools
+    from validate_boards import validate_boards
+
+    def brute_force_count_solutions(partial_board: np.ndarray) -> int:
+        """
+        `count_solutions` without a cap, by validating every way of filling the blanks
+        (see validate_boards) row by row. Independent of the solver, but exponential
+        in the number of blanks.
+        """
+        row_fillings = []
+        for row in partial_board:
+            blanks = np.flatnonzero(row == 0)
+            fillings = np.repeat(row[np.newaxis], 2 ** len(blanks), axis=0)
+            fillings[:, blanks] = np.asarray(list(itertools.product((1, 2), repeat=len(blanks))),
+                                             dtype=np.uint8).reshape(len(fillings), len(blanks))
+            row_fillings.append(fillings)
+        choices = np.asarray(list(itertools.product(*(range(len(f)) for f in row_fillings))), dtype=np.int64)
+        boards = np.stack([row_fillings[x][choices[:, x]] for x in range(len(row_fillings))], axis=1)
+        return int(np.count_nonzero(validate_boards(boards, require_complete=True) == 0))
+
+    # count_solutions against brute force, on random partial boards of valid (and
+    # some invalid) completed boards.
+    rng = np.random.default_rng(0)
+    for n in (4, 6):
+        for _ in range(200):
+            board = generate_completed_board(n, rng=rng)
+            board[rng.random((n, n)) < rng.uniform(0.2, 0.6)] = 0
+            if rng.random() < 0.2:
+                board[rng.integers(n), rng.integers(n)] = rng.integers(1, 3)
+            if np.count_nonzero(board == 0) > 16:
+                continue
+            expected = brute_force_count_solutions(board)
+            assert count_solutions(board, cap=n ** 4) == expected, board
+            assert count_solutions(board) == min(expected, 2), board
+    print("count_solutions agrees with brute force on random 4x4 and 6x6 partial boards")
     print(generate_game_board(4))
     print(generate_game_board(6))
     print(generate_game_board(8))
     # print(generate_game_board(12))
+    print("Unique solutions: {}".format(sum(has_unique_solution(generate_game_board(10)) for _ in range(100))))
     average_filled_fraction = sum(filled_fraction(generate_game_board(10)) for _ in range(100))
     print("Average filled fraction: {}".format(average_filled_fraction))
@@ -0,0 +1,65 @@
+"""
+Measures the import-to-first-puzzle time of each generator in a fresh process.
+
+Usage:
+    python cold_start.py [--n 10] [--warm-up] [--output cold_start.jsonl]
+
+Each measurement runs in its own interpreter, so it includes importing numba and
+loading (or compiling) the kernels. Run it twice after changing a kernel: the first
+run populates the numba cache, the second shows what a new worker pays.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+GENERATORS = {
+    "generate_full_board": "generate_completed_board",
+    "generate_sparse_gameboard": "generate_game_board",
+    "check_unique": "generate_game_board",
+    "generate_gameboard_slow_and_ineffective": "generate_game_board",
+}
+
+_PROBE = """
+import json, time
+start = time.perf_counter()
+import numba
+numba_imported = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+if {warm_up}:
+    import lazy_jit
+    lazy_jit.warm_up()
+warmed_up = time.perf_counter()
+{module}.{function}({n})
+done = time.perf_counter()
+print(json.dumps({{"numba_import": numba_imported - start, "module_import": imported - numba_imported,
+                  "warm_up": warmed_up - imported, "first_puzzle": done - warmed_up,
+                  "import_to_first_puzzle": done - start}}))
+"""
+
+
+def measure(module: str, n: int, warm_up: bool) -> dict:
+    """Runs one cold start of `module` in a subprocess and returns its timings in seconds."""
+    probe = _PROBE.format(module=module, function=GENERATORS[module], n=n, warm_up=warm_up)
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])  # Generators may print progress first.
+    return {"module": module, "n": n, "warm_up": warm_up, "timestamp": time.time(), **timings}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--warm-up", action="store_true", help="call lazy_jit.warm_up() before the first puzzle")
+    parser.add_argument("--output", help="append the results as JSON lines to this file")
+    args = parser.parse_args()
+    results = [measure(module, args.n, args.warm_up) for module in GENERATORS]
+    for result in results:
+        print(f"{result['module']:>42}: {result['import_to_first_puzzle']:.3f}s "
+              f"(numba {result['numba_import']:.3f}s, import {result['module_import']:.3f}s, "
+              f"warm-up {result['warm_up']:.3f}s, first puzzle {result['first_puzzle']:.3f}s)")
+    if args.output:
+        with open(args.output, "a") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
@@ -1,11 +1,16 @@
 import numpy as np
-from typing import List  # For type hints
+from typing import IO, Callable, Iterator, List, Optional, Tuple, Union  # For type hints
+from dataclasses import dataclass
 import functools  # For @functools.cache
-import itertools  # For itertools.combinations
-from numba import njit, uint8, bool_, int_
+import itertools  # For itertools.count
+import os
+import tempfile
+from numba import uint8, bool_, int_, int32, int64, float64, void
+from lazy_jit import lazy_njit
+from numba import types
 
 
-@njit(bool_(uint8[:]), cache=True)
+@lazy_njit(bool_(uint8[:]), cache=True)
 def vec_has_three_in_row(arr_input: np.ndarray) -> bool:
     """
     Check if array contains three consecutive identical non-zero values.
@@ -35,11 +40,11 @@ def generate_valid_rows(n: int) -> List[np.ndarray]:
     Generates all valid rows for a square binary puzzle board of size 'n'.
 
     A valid row must satisfy two conditions:
-    1. It must contain an equal number of 1s and 2s (or True/False, then converted to 1/2).
-       Specifically, it must have n/2 of one color (e.g., 1s or True).
+    1. It must contain an equal number of 1s and 2s, i.e. n/2 of each.
     2. It must not contain three consecutive identical values (e.g., not 1,1,1 or 2,2,2).
-       (The `has_three_in_row` check is for non-zero values, so 0,0,0 is implicitly allowed by that helper).
-       The rows generated here are boolean, then converted to int64 for `has_three_in_row`.
+
+    The rows are unpacked from `generate_valid_row_masks`, which enumerates them
+    directly and keeps them in an on-disk cache.
 
     This function is cached using @functools.cache to memoize results for a given 'n'.
 
@@ -49,33 +54,12 @@ def generate_valid_rows(n: int) -> List[np.ndarray]:
 
     Returns:
         List[np.ndarray]: A list of valid rows. Each row is a 1D NumPy array
-                          of int64 type, representing the binary values (e.g., 0s and 1s,
-                          or potentially 1s and 2s if adapted later, though boolean source
-                          implies 0s and 1s).
+                          of uint8 type, holding the colors 1 and 2.
     """
-    valid_rows: List[np.ndarray] = []
-
-    if n % 2 != 0:  # Original assert implies n must be even
-        raise ValueError("n must be a multiple of 2")
-        # return valid_rows # Return empty list for consistency if n is odd
-
-    half_n = n // 2
-    blank_row_template = np.ones(n, dtype=np.uint8)
-
-    # Use itertools.combinations as in the original pure Python version
-    for ones_pos in itertools.combinations(range(n), half_n):
-        candidate_row = blank_row_template.copy()
-        # ones_pos is a tuple of indices, convert to list for assignment
-        candidate_row[list(ones_pos)] = 2
+    return list(masks_to_rows(generate_valid_row_masks(n), n))
 
-        # has_three_in_row expects an int array
-        if not vec_has_three_in_row(candidate_row):
-            valid_rows.append(candidate_row)  # Store as uint8 arrays
 
-    return valid_rows
-
-
-@njit(bool_(uint8[:, :]), cache=True)  # has_three_in_row remains JITted
+@lazy_njit(bool_(uint8[:, :]), cache=True)  # has_three_in_row remains JITted
 def any_vec_has_last_three_in_row(arr_input: np.ndarray) -> bool:
     """
     2D array (checks each row, assuming rows are the segments to check, e.g., column segments of length 3).
@@ -87,7 +71,7 @@ def any_vec_has_last_three_in_row(arr_input: np.ndarray) -> bool:
     return False
 
 
-@njit(bool_(uint8[:], int_), cache=True)
+@lazy_njit(bool_(uint8[:], int_), cache=True)
 def vec_content_exceeds_limit(arr_input: np.ndarray, limit: int) -> bool:
     """
     Check if array contains more 1s or more 2s than the limit
@@ -106,7 +90,7 @@ def vec_content_exceeds_limit(arr_input: np.ndarray, limit: int) -> bool:
     return False
 
 
-@njit(bool_(uint8[:, :], int_), cache=True)
+@lazy_njit(bool_(uint8[:, :], int_), cache=True)
 def any_vec_content_exceeds_limit(arr_input: np.ndarray, limit: int) -> bool:
     for vec in arr_input:
         if vec_content_exceeds_limit(vec, limit):
@@ -179,19 +163,905 @@ def solve(grid: np.ndarray, valid_rows: List[np.ndarray],
     return np.empty((0, 0), dtype=np.uint8)  # Return empty if no solution from this path
 
 
-def generate_completed_board(n: int) -> np.ndarray:
-    valid_rows = list(np.random.default_rng().permutation(
-        generate_valid_rows(n)))  # generate_valid_rows is now imported
-    initial_grid = np.zeros((n, n), dtype=np.uint8)
-    initial_grid[0] = valid_rows.pop()
-    solution = solve(grid=initial_grid,
-                     valid_rows=valid_rows,
-                     n_accomplished=1,
-                     n_goal=n)
-    if solution.shape == (n, n):
-        return solution
+# --- Bit-packed engine ---
+# Each row is stored as an int64 mask with bit j set iff cell j holds color 2.
+# Per-column color counts are kept as bit-sliced counters: plane k holds bit k
+# of every column's count, so a whole row is added with a ripple-carry of word
+# operations and saturated columns are found with a handful of ANDs.
+_N_PLANES = 6  # enough for counts up to 63, i.e. any board that fits in an int64 mask
+
+
+@lazy_njit(int64[:](int_), cache=True)
+def _enumerate_valid_row_masks(n: int) -> np.ndarray:
+    """
+    Enumerates the valid rows of length n as bitmasks, by a depth-first search over
+    the cells that tracks the color counts and only ever extends valid prefixes.
+    """
+    half_n = n // 2
+    masks = np.empty(0, dtype=np.int64)
+    prefix = np.zeros(n + 1, dtype=np.int64)  # prefix[d]: mask of the first d cells
+    twos = np.zeros(n + 1, dtype=np.int64)  # twos[d]: number of 2s among them
+    next_bit = np.zeros(n + 1, dtype=np.int64)  # next value to try at each depth
+    for pass_number in range(2):  # First count the rows, then fill them in.
+        n_found = 0
+        depth = 0
+        while depth >= 0:
+            if depth == n:
+                if pass_number:
+                    masks[n_found] = prefix[n]
+                n_found += 1
+                depth -= 1
+                continue
+            bit = next_bit[depth]
+            if bit == 2:
+                next_bit[depth] = 0
+                depth -= 1
+                continue
+            next_bit[depth] += 1
+            twos_count = twos[depth] + bit
+            if twos_count > half_n or depth + 1 - twos_count > half_n:
+                continue
+            if depth >= 2 and ((prefix[depth] >> (depth - 1)) & 1) == bit \
+                    and ((prefix[depth] >> (depth - 2)) & 1) == bit:
+                continue
+            prefix[depth + 1] = prefix[depth] | (bit << depth)
+            twos[depth + 1] = twos_count
+            depth += 1
+        if not pass_number:
+            masks = np.empty(n_found, dtype=np.int64)
+    return masks
+
+
+_VALID_ROWS_CACHE_VERSION = 1  # Bump whenever the mask layout or ordering changes.
+MAX_N = 62  # The largest n whose rows fit in int64 bitmasks, and so the largest n generated.
+
+
+def _cache_path(filename: str) -> str:
+    cache_dir = os.environ.get("TAKUZU_CACHE_DIR",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__"))
+    return os.path.join(cache_dir, filename)
+
+
+def _write_cache(cache_path: str, write: Callable[[IO[bytes]], None]) -> None:
+    """Writes a cache file through a temporary file, so readers never see a partial cache."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(cache_path), delete=False) as f:
+            write(f)
+        os.replace(f.name, cache_path)
+    except OSError:
+        pass
+
+
+@functools.cache
+def generate_valid_row_masks(n: int) -> np.ndarray:
+    """
+    Returns all valid rows of length n packed into int64 bitmasks.
+
+    Bit j of a mask is set iff cell j of the row holds color 2.
+    The masks are persisted to an on-disk cache (in __pycache__ next to this file,
+    or in $TAKUZU_CACHE_DIR), so that later processes load them instead of
+    enumerating them again.
+
+    This function is cached using @functools.cache to memoize results for a given 'n'.
+    """
+    if n % 2 != 0:
+        raise ValueError("n must be a multiple of 2")
+    if n > MAX_N:
+        raise ValueError(f"n must be at most {MAX_N} for bit-packed rows")
+    cache_path = _cache_path(f"valid_row_masks.v{_VALID_ROWS_CACHE_VERSION}.n{n}.npy")
+    try:
+        masks = np.load(cache_path)
+        if masks.dtype == np.int64 and masks.ndim == 1:
+            return masks
+    except (OSError, ValueError):
+        pass
+    masks = _enumerate_valid_row_masks(n)
+    _write_cache(cache_path, lambda f: np.save(f, masks))
+    return masks
+
+
+@lazy_njit(int64[:](uint8[:, :]), cache=True)
+def rows_to_masks(grid: np.ndarray) -> np.ndarray:
+    masks = np.zeros(grid.shape[0], dtype=np.int64)
+    for (x, y), val in np.ndenumerate(grid):
+        if val == 2:
+            masks[x] |= np.int64(1) << y
+    return masks
+
+
+@lazy_njit(uint8[:, :](int64[:], int_), cache=True)
+def masks_to_rows(masks: np.ndarray, n: int) -> np.ndarray:
+    grid = np.empty((len(masks), n), dtype=np.uint8)
+    for x in range(len(masks)):
+        for y in range(n):
+            grid[x, y] = 1 + ((masks[x] >> y) & 1)
+    return grid
+
+
+@lazy_njit(void(int64[:], int64), cache=True)
+def _add_row_to_counters(planes: np.ndarray, row_mask: int) -> None:
+    carry = row_mask
+    for k in range(len(planes)):
+        if not carry:
+            break
+        plane = planes[k]
+        planes[k] = plane ^ carry
+        carry = plane & carry
+
+
+@lazy_njit(int64(int64[:], int_, int64), cache=True)
+def _columns_with_count(planes: np.ndarray, count: int, full: int) -> int:
+    """Mask of the columns whose bit-sliced counter equals `count`."""
+    matching = full
+    for k in range(len(planes)):
+        if (count >> k) & 1:
+            matching &= planes[k]
+        else:
+            matching &= ~planes[k]
+    return matching
+
+
+@lazy_njit(bool_(int64[:], int_), cache=True)
+def _has_duplicate_columns(row_masks: np.ndarray, n: int) -> bool:
+    column_masks = np.zeros(n, dtype=np.int64)
+    for x in range(len(row_masks)):
+        for y in range(n):
+            column_masks[y] |= ((row_masks[x] >> y) & 1) << x
+    column_masks.sort()
+    for y in range(1, n):
+        if column_masks[y] == column_masks[y - 1]:
+            return True
+    return False
+
+
+@lazy_njit(types.Tuple((int64[:], int32[:]))(int64[:], int_), cache=True)
+def _build_transition_index(row_masks: np.ndarray, n: int) -> tuple:
+    full = (np.int64(1) << n) - 1
+    n_rows = len(row_masks)
+    offsets = np.zeros(n_rows * n_rows + 1, dtype=np.int64)
+    candidates = np.empty(0, dtype=np.int32)
+    for pass_number in range(2):  # First count the candidates, then fill them in.
+        if pass_number:
+            offsets = np.cumsum(offsets)
+            candidates = np.empty(offsets[-1], dtype=np.int32)
+        for a in range(n_rows):
+            above = row_masks[a]
+            for b in range(n_rows):
+                below = row_masks[b]
+                # A column with two equal cells forces the opposite color underneath.
+                forced_twos = ~(above | below) & full
+                forced_ones = above & below
+                key = a * n_rows + b
+                cursor = offsets[key] if pass_number else 0
+                for c in range(n_rows):
+                    row = row_masks[c]
+                    if c == a or c == b or (row & forced_ones) or (~row & forced_twos):
+                        continue
+                    if pass_number:
+                        candidates[cursor] = c
+                    cursor += 1
+                if not pass_number:
+                    offsets[key + 1] = cursor
+    return offsets, candidates
+
+
+@functools.cache
+def generate_transition_index(n: int) -> tuple:
+    """
+    For every ordered pair of consecutive valid rows (a, b), the valid rows c that
+    may legally follow them, i.e. that create no three identical cells in any column
+    and differ from both a and b.
+
+    Rows are referred to by their position in `generate_valid_row_masks(n)`.
+    The index is stored in CSR form: the candidates following (a, b) are
+    `candidates[offsets[a * R + b]:offsets[a * R + b + 1]]`, where R is the number
+    of valid rows.
+
+    This function is cached using @functools.cache to memoize results for a given 'n'.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int64 `offsets` and int32 `candidates` arrays.
+    """
+    return _build_transition_index(generate_valid_row_masks(n), n)
+
+
+_MAX_INDEXED_N = 14  # The index grows as R**2 * (rows per pair): ~26 MB at n=14, ~270 MB at n=16.
+
+
+@lazy_njit(types.Tuple((int64[:], int64))(int64[:], int64[:], int64[:], int32[:], int_, int64), cache=True)
+def solve_bitboard(row_masks: np.ndarray, rank: np.ndarray,
+                   offsets: np.ndarray, candidates: np.ndarray, n: int,
+                   node_budget: int) -> tuple:
+    """
+    Bit-packed, backtracking counterpart of `solve`.
+
+    Runs an iterative depth-first search that places rows in increasing order of
+    `rank`, subject to: no three identical cells in any column, no column exceeding
+    n/2 of either color, no duplicate rows, and no duplicate columns once the board
+    is complete. From the third row on, only the rows listed in the transition
+    index for the last two placed rows are considered. On a dead end the search
+    backtracks to the previous row instead of giving up.
+
+    Args:
+        row_masks (np.ndarray): The valid rows, as returned by `generate_valid_row_masks`.
+        rank (np.ndarray): A permutation of range(len(row_masks)) giving the order
+                           in which rows are tried.
+        offsets, candidates (np.ndarray): The transition index, as returned by
+                                          `generate_transition_index`. If `offsets`
+                                          is empty, every unused row is scanned instead.
+        n (int): The dimension of the board.
+        node_budget (int): The maximal number of row placements before giving up.
+                           Non-positive values mean no limit.
+
+    Returns:
+        Tuple[np.ndarray, int]: The n row masks of the completed board (or an empty
+                                array if the budget ran out or no completion exists),
+                                and the number of row placements made.
+    """
+    full = (np.int64(1) << n) - 1
+    half_n = n // 2
+    n_rows = len(row_masks)
+    indexed = len(offsets) > 0
+    order = np.argsort(rank)
+    used = np.zeros(n_rows, dtype=np.bool_)
+    placed = np.empty(n, dtype=np.int64)
+    placed_index = np.empty(n, dtype=np.int64)
+    # twos_planes[d] / ones_planes[d] hold the column counters of the first d rows.
+    twos_planes = np.zeros((n + 1, _N_PLANES), dtype=np.int64)
+    ones_planes = np.zeros((n + 1, _N_PLANES), dtype=np.int64)
+    # Per-depth candidate lists (sorted by rank) and cursors into them.
+    max_listed = n_rows
+    if indexed:
+        max_listed = np.max(offsets[1:] - offsets[:-1])
+    listed = np.empty((n, max_listed), dtype=np.int64)
+    n_listed = np.zeros(n, dtype=np.int64)
+    cursor = np.zeros(n, dtype=np.int64)
+    nodes = 0
+
+    depth = 0
+    while True:
+        if cursor[depth] == 0:  # First visit of this depth: list its candidates.
+            if depth < 2 or not indexed:
+                n_listed[depth] = n_rows
+            else:
+                key = placed_index[depth - 2] * n_rows + placed_index[depth - 1]
+                following = candidates[offsets[key]:offsets[key + 1]]
+                by_rank = np.argsort(rank[following])
+                for j in range(len(following)):
+                    listed[depth, j] = following[by_rank[j]]
+                n_listed[depth] = len(following)
+        saturated_twos = _columns_with_count(twos_planes[depth], half_n, full)
+        saturated_ones = _columns_with_count(ones_planes[depth], half_n, full)
+        found = -1
+        while cursor[depth] < n_listed[depth]:
+            if depth < 2 or not indexed:
+                i = order[cursor[depth]]
+            else:
+                i = listed[depth, cursor[depth]]
+            cursor[depth] += 1
+            if used[i]:
+                continue
+            row = row_masks[i]
+            if (row & saturated_twos) or (~row & full & saturated_ones):
+                continue
+            if depth >= 2 and not indexed:
+                above = placed[depth - 2]
+                below = placed[depth - 1]
+                if (above & below & row) or (~(above | below | row) & full):
+                    continue
+            if depth == n - 1:
+                placed[depth] = row
+                if _has_duplicate_columns(placed, n):
+                    continue
+            found = i
+            break
+
+        if found < 0:  # Dead end: backtrack.
+            cursor[depth] = 0
+            if depth == 0:
+                return np.empty(0, dtype=np.int64), nodes
+            depth -= 1
+            used[placed_index[depth]] = False
+            continue
+
+        nodes += 1
+        used[found] = True
+        placed[depth] = row_masks[found]
+        placed_index[depth] = found
+        twos_planes[depth + 1] = twos_planes[depth]
+        ones_planes[depth + 1] = ones_planes[depth]
+        _add_row_to_counters(twos_planes[depth + 1], row_masks[found])
+        _add_row_to_counters(ones_planes[depth + 1], ~row_masks[found] & full)
+        depth += 1
+        if depth == n:
+            return placed, nodes
+        if 0 < node_budget <= nodes:
+            return np.empty(0, dtype=np.int64), nodes
+
+
+def luby(i: int) -> int:
+    """The i-th term (1-based) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+def restart_budgets(policy: str, base_budget: int) -> Iterator[int]:
+    """
+    Yields the node budget of each successive attempt under a restart policy.
+
+    Args:
+        policy (str): "luby" (base_budget times the Luby sequence), "geometric"
+                      (base_budget growing by 50% per restart) or "none" (a single
+                      attempt without limit).
+        base_budget (int): The node budget of the first attempt.
+    """
+    if policy == "none":
+        yield 0
+    elif policy == "luby":
+        for i in itertools.count(1):
+            yield base_budget * luby(i)
+    elif policy == "geometric":
+        budget = float(base_budget)
+        while True:
+            yield int(budget)
+            budget *= 1.5
+    else:
+        raise ValueError(f"Unknown restart policy {policy!r}")
+
+
+@dataclass
+class SolveStats:
+    """Telemetry of a single `generate_completed_board_with_stats` call."""
+    restarts: int = 0  # Attempts abandoned before the board was completed.
+    nodes: int = 0  # Row placements (bitboard engine) or moves tried (local engine) over all attempts.
+
+
+def _generate_completed_board_array(n: int, stats: SolveStats, rng: np.random.Generator) -> np.ndarray:
+    while True:
+        valid_rows = list(rng.permutation(
+            generate_valid_rows(n)))  # generate_valid_rows is now imported
+        initial_grid = np.zeros((n, n), dtype=np.uint8)
+        initial_grid[0] = valid_rows.pop()
+        solution = solve(grid=initial_grid,
+                         valid_rows=valid_rows,
+                         n_accomplished=1,
+                         n_goal=n)
+        if solution.shape == (n, n):
+            return solution
+        stats.restarts += 1
+
+
+def _generate_completed_board_bitboard(n: int, stats: SolveStats, rng: np.random.Generator,
+                                       restart_policy: str, base_budget: int) -> np.ndarray:
+    valid_row_masks = generate_valid_row_masks(n)
+    if n <= _MAX_INDEXED_N:
+        offsets, candidates = generate_transition_index(n)
     else:
-        return generate_completed_board(n)
+        offsets, candidates = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    for node_budget in restart_budgets(restart_policy, base_budget):
+        rank = rng.permutation(len(valid_row_masks))
+        placed, nodes = solve_bitboard(valid_row_masks, rank, offsets, candidates, n, node_budget)
+        stats.nodes += nodes
+        if len(placed) == n:
+            return masks_to_rows(placed, n)
+        stats.restarts += 1
+
+
+# --- Uniform sampler ---
+# Boards are counted with a transfer-matrix dynamic program over the rows. The
+# state after k rows is (second-to-last row, last row, per-column counts of 2s),
+# with the counts packed into a single base-(n/2 + 1) integer "code"; a state is
+# stored as key = (a * R + b) * base**n + code, R being the number of valid rows.
+# The program counts the boards that satisfy every rule except the distinctness
+# of non-adjacent rows and of columns. A board is drawn uniformly from that
+# relaxed set and kept only if it is fully valid, which makes the accepted boards
+# uniform over all valid boards.
+# Only the top half of the board is tabulated: the bottom half, read upwards, is
+# itself a top half, and the two are joined on complementary column counts.
+_MAX_UNIFORM_N = 10  # At n=12 the tables would no longer fit in memory.
+_UNIFORM_TABLES_CACHE_VERSION = 1
+
+
+@lazy_njit(int64[:](int64[:], int_), cache=True)
+def _row_codes(row_masks: np.ndarray, n: int) -> np.ndarray:
+    """The contribution of each row to the packed per-column counts of 2s."""
+    base = n // 2 + 1
+    row_codes = np.zeros(len(row_masks), dtype=np.int64)
+    for c in range(len(row_masks)):
+        for j in range(n - 1, -1, -1):
+            row_codes[c] = row_codes[c] * base + ((row_masks[c] >> j) & 1)
+    return row_codes
+
+
+@lazy_njit(types.Tuple((int64[:], int64[:]))(int64[:], int64[:], int64[:], int64[:], int32[:], int_, int_),
+      cache=True)
+def _next_count_layer(keys: np.ndarray, counts: np.ndarray, row_masks: np.ndarray,
+                      offsets: np.ndarray, candidates: np.ndarray, n: int, depth: int) -> tuple:
+    """Extends the count layer after `depth` rows to the layer after depth + 1 rows."""
+    n_rows = len(row_masks)
+    half_n = n // 2
+    base = half_n + 1
+    n_codes = base ** n
+    full = (np.int64(1) << n) - 1
+    row_codes = _row_codes(row_masks, n)
+    new_keys = np.empty(0, dtype=np.int64)
+    new_counts = np.empty(0, dtype=np.int64)
+    for pass_number in range(2):  # First count the successors, then fill them in.
+        n_successors = 0
+        for s in range(len(keys)):
+            pair = keys[s] // n_codes
+            code = keys[s] % n_codes
+            saturated_twos = 0
+            saturated_ones = 0
+            remaining = code
+            for j in range(n):
+                twos = remaining % base
+                remaining //= base
+                if twos == half_n:
+                    saturated_twos |= np.int64(1) << j
+                if depth - twos == half_n:
+                    saturated_ones |= np.int64(1) << j
+            for c in candidates[offsets[pair]:offsets[pair + 1]]:
+                row = row_masks[c]
+                if (row & saturated_twos) or (~row & full & saturated_ones):
+                    continue
+                if pass_number:
+                    new_keys[n_successors] = ((pair % n_rows) * n_rows + c) * n_codes + code + row_codes[c]
+                    new_counts[n_successors] = counts[s]
+                n_successors += 1
+        if not pass_number:
+            new_keys = np.empty(n_successors, dtype=np.int64)
+            new_counts = np.empty(n_successors, dtype=np.int64)
+    # Merge the successors that reached the same state.
+    order = np.argsort(new_keys)
+    merged_keys = np.empty(len(new_keys), dtype=np.int64)
+    merged_counts = np.zeros(len(new_keys), dtype=np.int64)
+    n_unique = 0
+    for s in order:
+        if n_unique == 0 or merged_keys[n_unique - 1] != new_keys[s]:
+            merged_keys[n_unique] = new_keys[s]
+            n_unique += 1
+        merged_counts[n_unique - 1] += new_counts[s]
+    return merged_keys[:n_unique].copy(), merged_counts[:n_unique].copy()
+
+
+@lazy_njit(bool_(int64, int64, int64, int64), cache=True)
+def _column_triple(above: int, middle: int, below: int, full: int) -> bool:
+    return bool((above & middle & below) or (~(above | middle | below) & full))
+
+
+@lazy_njit(int64[:](int64[:], int64[:], int64[:], int_), cache=True)
+def _join_weights(keys: np.ndarray, counts: np.ndarray, row_masks: np.ndarray, n: int) -> np.ndarray:
+    """
+    For every top-half state, the number of relaxed boards whose top half ends in it:
+    its own count times the summed counts of the compatible bottom-half states.
+    """
+    n_rows = len(row_masks)
+    half_n = n // 2
+    n_codes = (half_n + 1) ** n
+    full = (np.int64(1) << n) - 1
+    balanced_code = 0
+    for j in range(n):
+        balanced_code = balanced_code * (half_n + 1) + half_n
+    codes = keys % n_codes
+    by_code = np.argsort(codes)
+    sorted_codes = codes[by_code]
+    weights = np.zeros(len(keys), dtype=np.int64)
+    for t in range(len(keys)):
+        above = row_masks[keys[t] // n_codes // n_rows]
+        middle = row_masks[keys[t] // n_codes % n_rows]
+        target = balanced_code - codes[t]
+        start = np.searchsorted(sorted_codes, target)
+        stop = np.searchsorted(sorted_codes, target, side="right")
+        for s in by_code[start:stop]:
+            # The bottom half is read upwards: its last row is the row under `middle`.
+            below = row_masks[keys[s] // n_codes % n_rows]
+            further_below = row_masks[keys[s] // n_codes // n_rows]
+            if _column_triple(above, middle, below, full) or _column_triple(middle, below, further_below, full):
+                continue
+            weights[t] += counts[t] * counts[s]
+    return weights
+
+
+@functools.cache
+def _uniform_sampler_tables(n: int) -> tuple:
+    """
+    The count layers after 2, ..., n/2 rows, concatenated, with the start of each
+    layer and the join weights of the last layer.
+
+    The tables take about 40 s to build at n=10, so they are persisted to the same
+    on-disk cache as the valid rows.
+
+    This function is cached using @functools.cache to memoize results for a given 'n'.
+    """
+    if not 4 <= n <= _MAX_UNIFORM_N or n % 2:
+        raise ValueError(f"The uniform sampler supports even n from 4 to {_MAX_UNIFORM_N}")
+    cache_path = _cache_path(f"uniform_sampler.v{_UNIFORM_TABLES_CACHE_VERSION}"
+                             f".rows_v{_VALID_ROWS_CACHE_VERSION}.n{n}.npz")
+    try:
+        with np.load(cache_path) as cached:
+            return cached["keys"], cached["counts"], cached["layer_starts"], cached["join_weights"]
+    except (OSError, ValueError, KeyError):
+        pass
+    row_masks = generate_valid_row_masks(n)
+    offsets, candidates = generate_transition_index(n)
+    n_rows = len(row_masks)
+    n_codes = (n // 2 + 1) ** n
+    row_codes = _row_codes(row_masks, n)
+    pairs = np.array([(a, b) for a in range(n_rows) for b in range(n_rows) if a != b], dtype=np.int64)
+    keys = (pairs[:, 0] * n_rows + pairs[:, 1]) * n_codes + row_codes[pairs[:, 0]] + row_codes[pairs[:, 1]]
+    order = np.argsort(keys)
+    layers = [(keys[order], np.ones(len(keys), dtype=np.int64))]
+    for depth in range(2, n // 2):
+        layers.append(_next_count_layer(*layers[-1], row_masks, offsets, candidates, n, depth))
+    layer_starts = np.cumsum([0, 0, 0] + [len(keys) for keys, _ in layers])
+    all_keys = np.concatenate([keys for keys, _ in layers])
+    all_counts = np.concatenate([counts for _, counts in layers])
+    join_weights = _join_weights(*layers[-1], row_masks, n)
+    _write_cache(cache_path, lambda f: np.savez(f, keys=all_keys, counts=all_counts,
+                                                layer_starts=layer_starts, join_weights=join_weights))
+    return all_keys, all_counts, layer_starts, join_weights
+
+
+@functools.cache
+def _uniform_sampler_lookup(n: int) -> tuple:
+    """The cumulative join weights, and the last layer's states ordered by code."""
+    all_keys, all_counts, layer_starts, join_weights = _uniform_sampler_tables(n)
+    top_keys = all_keys[layer_starts[n // 2]:]
+    codes = top_keys % (n // 2 + 1) ** n
+    by_code = np.argsort(codes)
+    return np.cumsum(join_weights), by_code, codes[by_code]
+
+
+@lazy_njit(int64[:](int64, int64[:], int64[:], int64[:], int64[:], int_), cache=True)
+def _sample_half(state: int, all_keys: np.ndarray, all_counts: np.ndarray,
+                 layer_starts: np.ndarray, row_masks: np.ndarray, n: int) -> np.ndarray:
+    """
+    Draws uniformly one of the row sequences counted by the state at index `state`
+    of the last layer, by walking back through the layers with probabilities
+    proportional to the predecessors' counts.
+    """
+    n_rows = len(row_masks)
+    half_rows = n // 2
+    n_codes = (n // 2 + 1) ** n
+    full = (np.int64(1) << n) - 1
+    row_codes = _row_codes(row_masks, n)
+    rows = np.empty(half_rows, dtype=np.int64)
+    key = all_keys[state]
+    previous = key // n_codes // n_rows
+    last = key // n_codes % n_rows
+    code = key % n_codes
+    rows[half_rows - 2] = previous
+    rows[half_rows - 1] = last
+    for depth in range(half_rows, 2, -1):
+        # The state after `depth` rows is (previous, last, code); find the row before `previous`.
+        layer = all_keys[layer_starts[depth - 1]:layer_starts[depth]]
+        layer_counts = all_counts[layer_starts[depth - 1]:layer_starts[depth]]
+        code -= row_codes[last]
+        weights = np.zeros(n_rows, dtype=np.int64)
+        for o in range(n_rows):
+            if o == previous or o == last or _column_triple(row_masks[o], row_masks[previous], row_masks[last], full):
+                continue
+            target = (o * n_rows + previous) * n_codes + code
+            i = np.searchsorted(layer, target)
+            if i < len(layer) and layer[i] == target:
+                weights[o] = layer_counts[i]
+        pick = np.random.randint(0, np.sum(weights))
+        o = 0
+        while pick >= weights[o]:
+            pick -= weights[o]
+            o += 1
+        rows[depth - 3] = o
+        last = previous
+        previous = o
+    return rows
+
+
+@lazy_njit(int64[:](int64[:], int64[:], int64[:], int64[:], int64[:], int64[:], int64[:], int_), cache=True)
+def _sample_relaxed_board(all_keys: np.ndarray, all_counts: np.ndarray, layer_starts: np.ndarray,
+                          join_cumulative: np.ndarray, by_code: np.ndarray, sorted_codes: np.ndarray,
+                          row_masks: np.ndarray, n: int) -> np.ndarray:
+    """Draws uniformly a relaxed board, as the indices of its rows."""
+    n_rows = len(row_masks)
+    half_n = n // 2
+    n_codes = (half_n + 1) ** n
+    full = (np.int64(1) << n) - 1
+    top_start = layer_starts[half_n]
+    balanced_code = 0
+    for j in range(n):
+        balanced_code = balanced_code * (half_n + 1) + half_n
+    # Draw the top half's final state with probability proportional to its join weight...
+    t = np.searchsorted(join_cumulative, np.random.randint(0, join_cumulative[-1]), side="right")
+    key = all_keys[top_start + t]
+    above = row_masks[key // n_codes // n_rows]
+    middle = row_masks[key // n_codes % n_rows]
+    target = balanced_code - key % n_codes
+    # ...then a compatible bottom-half state with probability proportional to its count...
+    matching = by_code[np.searchsorted(sorted_codes, target):np.searchsorted(sorted_codes, target, side="right")]
+    weights = np.zeros(len(matching), dtype=np.int64)
+    for i in range(len(matching)):
+        s = top_start + matching[i]
+        below = row_masks[all_keys[s] // n_codes % n_rows]
+        further_below = row_masks[all_keys[s] // n_codes // n_rows]
+        if _column_triple(above, middle, below, full) or _column_triple(middle, below, further_below, full):
+            continue
+        weights[i] = all_counts[s]
+    pick = np.random.randint(0, np.sum(weights))
+    i = 0
+    while pick >= weights[i]:
+        pick -= weights[i]
+        i += 1
+    s = matching[i]
+    # ...and finally the rows leading to both states.
+    rows = np.empty(n, dtype=np.int64)
+    rows[:half_n] = _sample_half(top_start + t, all_keys, all_counts, layer_starts, row_masks, n)
+    rows[half_n:] = _sample_half(top_start + s, all_keys, all_counts, layer_starts, row_masks, n)[::-1]
+    return rows
+
+
+def _generate_completed_board_uniform(n: int, stats: SolveStats, rng: np.random.Generator) -> np.ndarray:
+    all_keys, all_counts, layer_starts, _ = _uniform_sampler_tables(n)
+    join_cumulative, by_code, sorted_codes = _uniform_sampler_lookup(n)
+    row_masks = generate_valid_row_masks(n)
+    seed_numba_random(int(rng.integers(2 ** 32)))
+    while True:
+        rows = _sample_relaxed_board(all_keys, all_counts, layer_starts, join_cumulative,
+                                     by_code, sorted_codes, row_masks, n)
+        placed = row_masks[rows]
+        if len(np.unique(rows)) == n and not _has_duplicate_columns(placed, n):
+            return masks_to_rows(placed, n)
+        stats.restarts += 1
+
+
+# --- Local-search engine ---
+# For boards too large for the exhaustive engines, a random grid is repaired
+# instead of built. Every row starts (and stays) valid on its own: balanced, with
+# no three identical cells. A move swaps a 1 and a 2 inside one row, which keeps
+# the row balanced; moves that create a triple in the row are rejected outright.
+# The remaining rule violations form the cost that simulated annealing drives to
+# zero: column triples, column imbalance (|2s - n/2| per column), and pairs of
+# equal rows or columns. Row and column masks (bit j set iff the cell holds
+# color 2) and per-column counts of 2s are maintained incrementally, so a move
+# is scored by rescanning only the lines it touches.
+_MIN_LOCAL_N = 14  # The smallest n for which engine="auto" picks the local search.
+_LOCAL_T_START = 0.3
+_LOCAL_T_END = 0.05
+
+
+@lazy_njit(int64(uint8[:], int_, int_), cache=True)
+def _triples_between(line: np.ndarray, start: int, stop: int) -> int:
+    """The number of s in [start, stop] such that line[s:s + 3] holds a single color."""
+    count = 0
+    for s in range(max(start, 0), min(stop, len(line) - 3) + 1):
+        if line[s] == line[s + 1] and line[s] == line[s + 2]:
+            count += 1
+    return count
+
+
+@lazy_njit(int64(uint8[:], int_, int_), cache=True)
+def _row_triples_around(row: np.ndarray, y1: int, y2: int) -> int:
+    """The triples of `row` that contain cell y1 or cell y2 (y1 < y2)."""
+    if y2 - y1 <= 2:
+        return _triples_between(row, y1 - 2, y2)
+    return _triples_between(row, y1 - 2, y1) + _triples_between(row, y2 - 2, y2)
+
+
+@lazy_njit(void(uint8[:]), cache=True)
+def _random_valid_row(row: np.ndarray) -> None:
+    """Fills `row` with a random balanced row without three identical cells."""
+    n = len(row)
+    while True:
+        counts = np.zeros(3, dtype=np.int64)
+        valid = True
+        for j in range(n):
+            color = 1 + np.random.randint(2)
+            if counts[color] == n // 2 or (j > 1 and row[j - 1] == color and row[j - 2] == color):
+                color = 3 - color
+                if counts[color] == n // 2 or (j > 1 and row[j - 1] == color and row[j - 2] == color):
+                    valid = False
+                    break
+            row[j] = color
+            counts[color] += 1
+        if valid:
+            return
+
+
+@lazy_njit(int64(uint8[:, :], int64[:], int64[:], int64[:], int_, int_, int_), cache=True)
+def _move_cost(board: np.ndarray, col_twos: np.ndarray, row_masks: np.ndarray, col_masks: np.ndarray,
+               x: int, y1: int, y2: int) -> int:
+    """The part of the cost that a swap of cells (x, y1) and (x, y2) can change."""
+    half_n = board.shape[0] // 2
+    cost = (_triples_between(board[:, y1], x - 2, x) + _triples_between(board[:, y2], x - 2, x)
+            + abs(col_twos[y1] - half_n) + abs(col_twos[y2] - half_n))
+    for k in range(len(row_masks)):
+        if k != x and row_masks[k] == row_masks[x]:
+            cost += 1
+        if k != y1 and k != y2:
+            cost += (col_masks[k] == col_masks[y1]) + (col_masks[k] == col_masks[y2])
+    return cost + (col_masks[y1] == col_masks[y2])
+
+
+@lazy_njit(void(uint8[:, :], int64[:], int64[:], int64[:], int_, int_, int_), cache=True)
+def _swap_cells(board: np.ndarray, col_twos: np.ndarray, row_masks: np.ndarray, col_masks: np.ndarray,
+                x: int, y1: int, y2: int) -> None:
+    """Swaps cells (x, y1) and (x, y2), which hold different colors."""
+    board[x, y1], board[x, y2] = board[x, y2], board[x, y1]
+    row_masks[x] ^= (np.int64(1) << y1) | (np.int64(1) << y2)
+    col_masks[y1] ^= np.int64(1) << x
+    col_masks[y2] ^= np.int64(1) << x
+    change = 1 if board[x, y1] == 2 else -1
+    col_twos[y1] += change
+    col_twos[y2] -= change
+
+
+@lazy_njit(types.Tuple((uint8[:, :], int64, int64))(int_, int64, float64, float64), cache=True)
+def anneal_board(n: int, max_steps: int, t_start: float, t_end: float) -> tuple:
+    """
+    Repairs a random grid of valid rows into a completed board by simulated annealing,
+    drawing from numba's global np.random state.
+
+    Args:
+        n (int): The dimension of the board. Must be even and at most 62.
+        max_steps (int): The number of moves tried before giving up.
+        t_start, t_end (float): The temperature of the first and last move; it
+                                decreases geometrically in between.
+
+    Returns:
+        Tuple[np.ndarray, int, int]: The board, its remaining cost (0 if it is
+                                     completed), and the number of moves tried.
+    """
+    board = np.empty((n, n), dtype=np.uint8)
+    for x in range(n):
+        _random_valid_row(board[x])
+    col_twos = np.zeros(n, dtype=np.int64)
+    row_masks = np.zeros(n, dtype=np.int64)
+    col_masks = np.zeros(n, dtype=np.int64)
+    for x in range(n):
+        for y in range(n):
+            if board[x, y] == 2:
+                row_masks[x] |= np.int64(1) << y
+                col_masks[y] |= np.int64(1) << x
+                col_twos[y] += 1
+    cost = 0
+    for i in range(n):
+        cost += _triples_between(board[:, i], 0, n) + abs(col_twos[i] - n // 2)
+        for k in range(i + 1, n):
+            cost += (row_masks[i] == row_masks[k]) + (col_masks[i] == col_masks[k])
+
+    temperature = t_start
+    cooling = (t_end / t_start) ** (1. / max_steps)
+    steps = 0
+    while cost > 0 and steps < max_steps:
+        steps += 1
+        temperature *= cooling
+        x = np.random.randint(n)
+        y1 = np.random.randint(n)
+        y2 = np.random.randint(n)
+        while board[x, y2] == board[x, y1]:
+            y2 = np.random.randint(n)
+        if y2 < y1:
+            y1, y2 = y2, y1
+        before = _move_cost(board, col_twos, row_masks, col_masks, x, y1, y2)
+        _swap_cells(board, col_twos, row_masks, col_masks, x, y1, y2)
+        if not _row_triples_around(board[x], y1, y2):
+            delta = _move_cost(board, col_twos, row_masks, col_masks, x, y1, y2) - before
+            if delta <= 0 or np.random.random() < np.exp(-delta / temperature):
+                cost += delta
+                continue
+        _swap_cells(board, col_twos, row_masks, col_masks, x, y1, y2)  # Undo the rejected move.
+    return board, cost, steps
+
+
+def _generate_completed_board_local(n: int, stats: SolveStats, rng: np.random.Generator,
+                                    base_budget: int) -> np.ndarray:
+    if n > MAX_N:
+        raise ValueError(f"The local engine supports n <= {MAX_N}, got {n}")
+    seed_numba_random(int(rng.integers(2 ** 32)))
+    while True:
+        board, cost, steps = anneal_board(n, base_budget, _LOCAL_T_START, _LOCAL_T_END)
+        stats.nodes += steps
+        if cost == 0:
+            return board
+        stats.restarts += 1
+
+
+def generate_completed_board_with_stats(n: int, engine: str = "auto",
+                                        restart_policy: str = "luby",
+                                        base_budget: int = 0,
+                                        rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, SolveStats]:
+    """
+    Generates a random completed n x n board and reports how hard it was to find.
+
+    Args:
+        n (int): The dimension of the board. Must be even.
+        engine (str): "bitboard" uses the backtracking `solve_bitboard`;
+                      "array" uses the reference NumPy-array `solve`, which does not
+                      backtrack and restarts from scratch on every dead end;
+                      "uniform" draws every valid board with equal probability
+                      (n <= 10 only), counting rejected draws as restarts;
+                      "local" repairs a random grid with `anneal_board` (n <= 62),
+                      restarting whenever the annealing schedule ends unsolved;
+                      "auto" (default) picks "bitboard" below n=14 and "local" from
+                      there on, where it is the faster of the two.
+        restart_policy (str): How the bitboard engine budgets its attempts, see
+                              `restart_budgets`.
+        base_budget (int): The node budget of the first bitboard attempt, defaulting
+                           to 32 * n, or the number of moves of every local-search
+                           attempt, defaulting to 4000 * n * n.
+        rng (np.random.Generator): The source of randomness. Defaults to a fresh,
+                                   unseeded generator.
+
+    Returns:
+        Tuple[np.ndarray, SolveStats]: The completed board and its search telemetry.
+    """
+    if n % 2 != 0:
+        raise ValueError("n must be a multiple of 2")
+    stats = SolveStats()
+    if rng is None:
+        rng = np.random.default_rng()
+    if engine == "auto":
+        engine = "bitboard" if n < _MIN_LOCAL_N else "local"
+    if engine == "bitboard":
+        board = _generate_completed_board_bitboard(n, stats, rng, restart_policy, base_budget or 32 * n)
+    elif engine == "array":
+        board = _generate_completed_board_array(n, stats, rng)
+    elif engine == "uniform":
+        board = _generate_completed_board_uniform(n, stats, rng)
+    elif engine == "local":
+        board = _generate_completed_board_local(n, stats, rng, base_budget or 4000 * n * n)
+    else:
+        raise ValueError(f"Unknown engine {engine!r}")
+    return board, stats
+
+
+def generate_completed_board(n: int, engine: str = "auto",
+                             rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Generates a random completed n x n board.
+
+    Args:
+        n (int): The dimension of the board. Must be even.
+        engine (str): "bitboard" uses the bit-packed `solve_bitboard`, "array" the
+                      reference NumPy-array `solve`, "uniform" the unbiased sampler
+                      (n <= 10), "local" the local search `anneal_board` (n <= 62),
+                      and "auto" (default) "bitboard" below n=14, "local" above.
+        rng (np.random.Generator): The source of randomness. Defaults to a fresh,
+                                   unseeded generator.
+    """
+    return generate_completed_board_with_stats(n, engine=engine, rng=rng)[0]
+
+
+@lazy_njit(void(int64), cache=True)
+def seed_numba_random(seed: int) -> None:
+    """
+    Seeds the global np.random state used inside numba-compiled functions
+    (such as the clue-removal kernels), which is separate from NumPy's own.
+    """
+    np.random.seed(seed)
+
+
+def seeded_rng(seed: Union[None, int, np.random.SeedSequence]) -> np.random.Generator:
+    """
+    A Generator for `seed`, after seeding from it the global states that the
+    clue-removal code draws from: numba's (see `seed_numba_random`) and NumPy's
+    legacy np.random.
+
+    Passing the returned Generator as `rng` to `generate_completed_board` makes a
+    whole generation path a deterministic function of `seed`, across processes.
+    """
+    rng = np.random.default_rng(seed)
+    global_seed = int(rng.integers(2 ** 32))
+    seed_numba_random(global_seed)
+    np.random.seed(global_seed)
+    return rng
 
 
 if __name__ == "__main__":
@@ -202,3 +1072,10 @@ if __name__ == "__main__":
     #     print(row-1)
     for i in range(3):
         print(generate_completed_board(n=10) - 1)
+    for engine in ("auto", "bitboard", "array", "uniform", "local"):
+        for odd_n in (5, 15):
+            try:
+                generate_completed_board(odd_n, engine=engine)
+            except ValueError:
+                continue
+            raise AssertionError(f"engine={engine!r} accepted odd n={odd_n}")
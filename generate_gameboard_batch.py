@@ -0,0 +1,148 @@
+import os
+import multiprocessing
+import numpy as np
+from typing import Optional, Tuple, Union  # For type hints
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from generate_full_board import generate_completed_board, seeded_rng
+from generate_sparse_gameboard import _generate_game_board
+from board_symmetry import canonical_rows, distinct_variants
+
+
+def _warm_up_worker(n: int) -> None:
+    """
+    Runs once in every worker process, so that loading the numba caches and
+    building the valid rows and transition index for size n are not charged
+    to the first chunk.
+    """
+    _generate_game_board(generate_completed_board(n))
+
+
+def _generate_chunk(n: int, count: int, seed_sequence: np.random.SeedSequence,
+                    amplify: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Generates `count` puzzles (and their solutions) from a single random stream.
+
+    Both NumPy's generator (used for completed boards) and numba's global state
+    (used by the clue-removal kernel) are seeded from `seed_sequence`.
+
+    With amplify=True, each completed board is used for all its distinct symmetric
+    variants (see board_symmetry.distinct_variants), each with its own clue
+    removal, before a new one is generated. Removal often blanks symmetric
+    patterns on different variants, so a puzzle that is a symmetry of an earlier
+    puzzle from the same completed board is discarded.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The puzzles, their solutions, and
+                                                   the number of distinct puzzles
+                                                   produced from each completed board.
+    """
+    rng = seeded_rng(seed_sequence)
+    puzzles = np.empty((count, n, n), dtype=np.uint8)
+    solutions = np.empty((count, n, n), dtype=np.uint8)
+    variant_counts = []
+    i = 0
+    while i < count:
+        completed_board = generate_completed_board(n, rng=rng)
+        variants = distinct_variants(completed_board) if amplify else completed_board[np.newaxis]
+        seen = set()
+        for variant in variants:
+            if i == count:
+                break
+            puzzle = _generate_game_board(variant.copy())
+            if amplify:
+                key = canonical_rows(puzzle[np.newaxis])[0].tobytes()
+                if key in seen:
+                    continue
+                seen.add(key)
+            solutions[i] = variant
+            puzzles[i] = puzzle
+            i += 1
+        variant_counts.append(len(seen) if amplify else 1)
+    return puzzles, solutions, np.asarray(variant_counts, dtype=np.int64)
+
+
+def generate_game_boards(n: int, count: int, workers: Optional[int] = None,
+                         seed: Union[None, int, np.random.SeedSequence] = None,
+                         chunk_size: int = 64,
+                         return_solutions: bool = False,
+                         amplify: bool = False,
+                         return_variant_counts: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, ...]]:
+    """
+    Generates many puzzles in parallel, with the same algorithm as
+    generate_sparse_gameboard.generate_game_board.
+
+    The work is split into chunks of `chunk_size` puzzles, each with its own
+    independent random stream spawned from `seed`. The output therefore depends
+    only on `seed` and `chunk_size`, not on the number of workers or on the order
+    in which chunks finish.
+
+    Args:
+        n (int): The dimension of the boards.
+        count (int): The number of puzzles to generate.
+        workers (int): The number of worker processes. Defaults to os.cpu_count().
+                       With workers=1 everything runs in the calling process.
+        seed (int or np.random.SeedSequence): The root seed. Defaults to fresh entropy.
+        chunk_size (int): The number of puzzles generated per task.
+        return_solutions (bool): Whether to also return the completed boards.
+        amplify (bool): Whether to reuse each completed board for up to 16 puzzles,
+                        one per distinct symmetric variant, which removes most of
+                        the completed-board search cost. The variants of a board
+                        are consecutive in the output.
+        return_variant_counts (bool): Whether to also return the number of distinct
+                                      puzzles made from each completed board
+                                      (all ones unless `amplify` is set).
+
+    Returns:
+        np.ndarray: A contiguous (count, n, n) uint8 array of puzzles, followed by
+                    the matching array of solutions if `return_solutions` is set,
+                    and by the variant counts if `return_variant_counts` is set.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    starts = list(range(0, count, chunk_size))
+    chunk_seeds = seed.spawn(len(starts))
+    puzzles = np.empty((count, n, n), dtype=np.uint8)
+    solutions = np.empty((count, n, n), dtype=np.uint8)
+    variant_counts = [np.zeros(0, dtype=np.int64)] * len(starts)
+
+    if workers == 1:
+        for k, (start, chunk_seed) in enumerate(zip(starts, chunk_seeds)):
+            stop = min(start + chunk_size, count)
+            puzzles[start:stop], solutions[start:stop], variant_counts[k] = _generate_chunk(
+                n, stop - start, chunk_seed, amplify)
+    else:
+        # Workers are spawned rather than forked: forking a process in which a prange
+        # kernel has run copies numba's live threading runtime, and the workers then
+        # crash or hang. _warm_up_worker loads everything they need.
+        with ProcessPoolExecutor(max_workers=workers, initializer=_warm_up_worker, initargs=(n,),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(_generate_chunk, n, min(chunk_size, count - start), chunk_seed, amplify): start
+                       for start, chunk_seed in zip(starts, chunk_seeds)}
+            for future in as_completed(futures):
+                start = futures[future]
+                chunk_puzzles, chunk_solutions, variant_counts[start // chunk_size] = future.result()
+                puzzles[start:start + len(chunk_puzzles)] = chunk_puzzles
+                solutions[start:start + len(chunk_solutions)] = chunk_solutions
+
+    outputs = (puzzles,)
+    if return_solutions:
+        outputs += (solutions,)
+    if return_variant_counts:
+        outputs += (np.concatenate(variant_counts) if variant_counts else np.zeros(0, dtype=np.int64),)
+    return outputs if len(outputs) > 1 else puzzles
+
+
+if __name__ == "__main__":
+    import time
+    start_time = time.perf_counter()
+    boards = generate_game_boards(10, 1000, seed=0)
+    print(f"Generated {len(boards)} boards in {time.perf_counter() - start_time:.2f}s "
+          f"with {os.cpu_count()} workers")
+    print(boards[0])
+    start_time = time.perf_counter()
+    boards, variant_counts = generate_game_boards(10, 1000, seed=0, amplify=True, return_variant_counts=True)
+    print(f"Generated {len(boards)} boards from {len(variant_counts)} completed boards "
+          f"({variant_counts.mean():.1f} distinct puzzles each) in {time.perf_counter() - start_time:.2f}s "
+          f"with amplify=True")
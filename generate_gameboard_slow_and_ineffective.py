@@ -1,10 +1,12 @@
 import numpy as np
-from numba import njit, uint8, int_, float64, bool_
-from generate_full_board import generate_completed_board
+from typing import Optional  # For type hints
+from numba import prange, uint8, int_, int64, float64, bool_
+from lazy_jit import lazy_njit
 from generate_sparse_gameboard import reliance_scores
+from generation_stats import new_counters, count, REMOVAL_ITERATIONS, RULE_CHECKS, SCORE_RECOMPUTATIONS
 
 
-@njit(bool_(uint8[:, :], int_, int_), cache=True)
+@lazy_njit(bool_(uint8[:, :], int_, int_), cache=True)
 def violation_detected(board: np.ndarray, x: int, y: int) -> bool:
 
     n_rows, n_columns = board.shape
@@ -58,7 +60,7 @@ def violation_detected(board: np.ndarray, x: int, y: int) -> bool:
                 return True
     return False
 
-@njit(bool_[:, :](uint8[:, :]), cache=True)
+@lazy_njit(bool_[:, :](uint8[:, :]), cache=True)
 def violation_locations(board: np.ndarray) -> np.ndarray:
     violations_places = np.asarray(board > 1)
     for (x, y), true_color in np.ndenumerate(board):
@@ -70,19 +72,31 @@ def violation_locations(board: np.ndarray) -> np.ndarray:
         board[x, y] = true_color
     return violations_places
 
-@njit(int_[:, :](uint8[:, :]), cache=True)
+# The lookahead kernels below score every candidate cell independently, so they
+# run the candidates in parallel with prange. violation_locations and
+# ambiguity_count temporarily write to the board they inspect, so each candidate
+# is scored on its own (thread-local) copy of the board.
+# They are only called from Python: a cached kernel calling a cached parallel
+# kernel crashes the process once both are loaded from the numba cache.
+@lazy_njit(int_[:](uint8[:, :], int64[:]), parallel=True, cache=True)
+def blanked_violation_totals(board: np.ndarray, flat_indices: np.ndarray) -> np.ndarray:
+    """violation_locations(board).sum() after blanking each of the cells `flat_indices` in turn."""
+    totals = np.zeros(flat_indices.shape[0], dtype=np.int_)
+    for k in prange(flat_indices.shape[0]):
+        local_board = board.copy()
+        local_board.flat[flat_indices[k]] = 0
+        totals[k] = violation_locations(local_board).sum()
+    return totals
+
+
 def subsequent_violation_counts(board: np.ndarray) -> np.ndarray:
-    subsequent_violation_counts = np.zeros(board.shape, dtype=np.int_)
-    for (x, y), true_color in np.ndenumerate(board):
-        if not true_color:
-            continue
-        board[x, y] = 0
-        # subsequent_violation_counts[x, y] = reliance_scores(board).sum()
-        subsequent_violation_counts[x, y] = violation_locations(board).sum()
-        board[x, y] = true_color
-    return subsequent_violation_counts
+    subsequent_violation_counts = np.zeros(board.size, dtype=np.int_)
+    filled = np.flatnonzero(board).astype(np.int64)
+    # subsequent_violation_counts[x, y] = reliance_scores(board).sum()
+    subsequent_violation_counts[filled] = blanked_violation_totals(board, filled)
+    return subsequent_violation_counts.reshape(board.shape)
 
-@njit(int_(uint8[:, :], uint8[:, :]), cache=True)
+@lazy_njit(int_(uint8[:, :], uint8[:, :]), cache=True)
 def ambiguity_count(full_board: np.ndarray, partial_board: np.ndarray) -> int:
     ambiguities_encountered = 0
     for (x, y), current_color in np.ndenumerate(partial_board):
@@ -96,55 +110,75 @@ def ambiguity_count(full_board: np.ndarray, partial_board: np.ndarray) -> int:
         partial_board[x, y] = 0
     return ambiguities_encountered
 
-@njit(int_[:, :](uint8[:, :], uint8[:, :]), cache=True)
+@lazy_njit(int_[:, :](uint8[:, :], uint8[:, :]), parallel=True, cache=True)
 def subsequent_ambiguity_counts(full_board: np.ndarray, partial_board: np.ndarray) -> np.ndarray:
+    n_rows, n_columns = partial_board.shape
     ambiguity_count_if_blanked = np.zeros(partial_board.shape, dtype=np.int_)
-    for (x, y), true_color in np.ndenumerate(partial_board):
+    for flat_index in prange(n_rows * n_columns):
+        x, y = flat_index // n_columns, flat_index % n_columns
+        true_color = partial_board[x, y]
         if not true_color:
             continue
-        new_color = 3 - int(true_color)
-        partial_board[x, y] = new_color
-        if violation_detected(partial_board, x, y):
-            partial_board[x, y] = 0
-            ambiguity_count_if_blanked[x,y] = 1 + ambiguity_count(full_board, partial_board)
-        partial_board[x, y] = true_color
+        local_board = partial_board.copy()
+        local_board[x, y] = 3 - int(true_color)
+        if violation_detected(local_board, x, y):
+            local_board[x, y] = 0
+            ambiguity_count_if_blanked[x, y] = 1 + ambiguity_count(full_board, local_board)
     return ambiguity_count_if_blanked
 
-# @njit(uint8[:, :](uint8[:, :]), cache=True)
-# def _generate_game_board(board: np.ndarray) -> np.ndarray:
-#     d = board.shape[1]
-#     violations_places = violation_locations(board)
-#     flat_violation_locations = np.flatnonzero(violations_places)
-#     while flat_violation_locations.shape[0]:
-#         next_violations = subsequent_violation_counts(board).ravel()[flat_violation_locations]
-#         min_next_violation = next_violations.min()
-#         where_min_next_violation = flat_violation_locations[next_violations == min_next_violation]
-#         chosen_cell = np.random.choice(where_min_next_violation)
-#         last_removed_pair = np.divmod(chosen_cell, d)
-#         board[last_removed_pair] = 0
-#         last_color = np.random.randint(1,3)
-#         violations_places = violation_locations(board)
-#         violations_places = np.logical_and(violations_places, board == last_color)
-#         flat_violation_locations = np.flatnonzero(violations_places)
-#     return board
+# The removers below call the lookahead kernels above, so they run their loops in
+# Python. They draw from numba's random state (see seed_numba_random), as
+# compiled removers do.
+@lazy_njit(int64(int64[:]), cache=True)
+def _random_choice(candidates: np.ndarray) -> int:
+    return np.random.choice(candidates)
 
-# @njit(uint8[:, :](uint8[:, :]), cache=True)
-# def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
-#     partial_board = full_board.copy()
-#     how_ambiguous_each = subsequent_ambiguity_counts(full_board, partial_board)
-#     max_ambiguity = how_ambiguous_each.max()
-#     while max_ambiguity > 0:
-#         # sorted_ambiguities = np.unique(how_ambiguous_each)
-#         # if sorted_ambiguities[0]:
-#         #     min_ambiguity = sorted_ambiguities[0]
-#         # else:
-#         #     min_ambiguity = sorted_ambiguities[1]
-#         where_max_ambiguity = np.flatnonzero(how_ambiguous_each == max_ambiguity)
-#         chosen_cell = np.random.choice(where_max_ambiguity)
-#         partial_board.flat[chosen_cell] = 0
-#         how_ambiguous_each = subsequent_ambiguity_counts(full_board, partial_board)
-#         max_ambiguity = how_ambiguous_each.max()
-#     return partial_board
+@lazy_njit(int64(int64, int64), cache=True)
+def _random_integer(low: int, high: int) -> int:
+    return np.random.randint(low, high)
+
+def _generate_game_board_min_subsequent_violations(full_board: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """
+    Among the cells whose color is forced, blanks one that leaves the fewest forced
+    cells behind (see subsequent_violation_counts), then restricts the next choice
+    to the forced cells of a random color.
+    """
+    board = full_board.copy()
+    violations_places = violation_locations(board)
+    flat_violation_locations = np.flatnonzero(violations_places)
+    while flat_violation_locations.shape[0]:
+        count(counters, REMOVAL_ITERATIONS, 1)
+        if counters.shape[0]:
+            count(counters, SCORE_RECOMPUTATIONS, np.count_nonzero(board) + 1)
+        next_violations = subsequent_violation_counts(board).ravel()[flat_violation_locations]
+        min_next_violation = next_violations.min()
+        where_min_next_violation = flat_violation_locations[next_violations == min_next_violation]
+        board.flat[_random_choice(where_min_next_violation)] = 0
+        last_color = _random_integer(1, 3)
+        violations_places = violation_locations(board)
+        violations_places = np.logical_and(violations_places, board == last_color)
+        flat_violation_locations = np.flatnonzero(violations_places)
+    return board
+
+def _generate_game_board_max_ambiguity(full_board: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """Among the cells whose color is forced, blanks one that leaves the most ambiguous cells behind."""
+    partial_board = full_board.copy()
+    how_ambiguous_each = subsequent_ambiguity_counts(full_board, partial_board)
+    count(counters, SCORE_RECOMPUTATIONS, 1)
+    max_ambiguity = how_ambiguous_each.max()
+    while max_ambiguity > 0:
+        count(counters, REMOVAL_ITERATIONS, 1)
+        # sorted_ambiguities = np.unique(how_ambiguous_each)
+        # if sorted_ambiguities[0]:
+        #     min_ambiguity = sorted_ambiguities[0]
+        # else:
+        #     min_ambiguity = sorted_ambiguities[1]
+        where_max_ambiguity = np.flatnonzero(how_ambiguous_each == max_ambiguity)
+        partial_board.flat[_random_choice(where_max_ambiguity)] = 0
+        how_ambiguous_each = subsequent_ambiguity_counts(full_board, partial_board)
+        count(counters, SCORE_RECOMPUTATIONS, 1)
+        max_ambiguity = how_ambiguous_each.max()
+    return partial_board
 
 # @njit(uint8[:, :](uint8[:, :]), cache=True)
 # def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
@@ -174,21 +208,24 @@ def subsequent_ambiguity_counts(full_board: np.ndarray, partial_board: np.ndarra
 #         actual_violations = violations_count.ravel()[np.flatnonzero(violations_count)]
 #     return partial_board
 
-@njit(uint8[:, :](uint8[:, :]), cache=True)
-def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
-    """We select cells to drop based on least number of rule violations, but then further sort by maximum number of cells that can still be blanked"""
+def _generate_game_board_counted(full_board: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    """_generate_game_board, maintaining the generation_stats counters in `counters`."""
     partial_board = full_board.copy()
     violations_count = reliance_scores(partial_board)
+    if counters.shape[0]:
+        count(counters, SCORE_RECOMPUTATIONS, 1)
+        count(counters, RULE_CHECKS, np.count_nonzero(partial_board))
     actual_violations = violations_count.ravel()[np.flatnonzero(violations_count)]
     while actual_violations.shape[0]:
+        count(counters, REMOVAL_ITERATIONS, 1)
         min_violations = actual_violations.min()
         where_min_violations = np.flatnonzero(violations_count == min_violations)
         for_ambiguity_count_sorting = np.zeros(full_board.shape, dtype=np.int_).ravel()
-        for flat_index in where_min_violations:
-            true_color = partial_board.flat[flat_index]
-            partial_board.flat[flat_index] = 0
-            for_ambiguity_count_sorting[flat_index] = 1 + violation_locations(partial_board).sum()
-            partial_board.flat[flat_index] = true_color
+        for_ambiguity_count_sorting[where_min_violations] = 1 + blanked_violation_totals(
+            partial_board, where_min_violations.astype(np.int64))
+        if counters.shape[0]:
+            count(counters, SCORE_RECOMPUTATIONS, where_min_violations.shape[0])
+            count(counters, RULE_CHECKS, where_min_violations.shape[0] * (np.count_nonzero(partial_board) - 1))
         max_ambiguity = for_ambiguity_count_sorting.max()
         # sorted_ambiguities = np.unique(for_ambiguity_count_sorting)
         # if sorted_ambiguities[0]:
@@ -196,20 +233,31 @@ def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
         # else:
         #     min_ambiguity = sorted_ambiguities[1]
         where_max_ambiguous = np.flatnonzero(for_ambiguity_count_sorting == max_ambiguity)
-        chosen_cell = np.random.choice(where_max_ambiguous)
-        partial_board.flat[chosen_cell] = 0
+        partial_board.flat[_random_choice(where_max_ambiguous)] = 0
         violations_count = reliance_scores(partial_board)
+        if counters.shape[0]:
+            count(counters, SCORE_RECOMPUTATIONS, 1)
+            count(counters, RULE_CHECKS, np.count_nonzero(partial_board))
         actual_violations = violations_count.ravel()[np.flatnonzero(violations_count)]
     return partial_board
 
-@njit(float64(uint8[:, :]), cache=True)
+def _generate_game_board(full_board: np.ndarray) -> np.ndarray:
+    """We select cells to drop based on least number of rule violations, but then further sort by maximum number of cells that can still be blanked"""
+    return _generate_game_board_counted(full_board, new_counters(enabled=False))
+
+@lazy_njit(float64(uint8[:, :]), cache=True)
 def filled_fraction(partial_board: np.array) -> float:
     return np.divide(np.count_nonzero(partial_board), partial_board.size)
 
 
-def generate_game_board(n: int) -> np.array:
-    completed_board = generate_completed_board(n)
-    return _generate_game_board(completed_board)
+def generate_game_board(n: int, stats: bool = False, seed: Optional[int] = None):
+    """
+    Generates an n x n puzzle, as a deterministic function of `seed` if one is given.
+
+    With stats=True, returns the puzzle together with a GenerationStats.
+    """
+    from removal_strategies import generate_with_remover  # removal_strategies imports this module.
+    return generate_with_remover(n, _generate_game_board_counted, stats, seed)
     # candidate_board = np.ones((1, 1), dtype=np.uint8)
     # i = 0
     # while True:
@@ -222,10 +270,24 @@ def generate_game_board(n: int) -> np.array:
 
 
 if __name__ == "__main__":
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    # Warming up, then calling the lookahead remover in two more fresh processes
+    # sharing one empty numba cache, used to crash the third process.
+    with tempfile.TemporaryDirectory() as cache_dir:
+        environment = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+        probe = ("import numpy as np; from generate_full_board import generate_completed_board; "
+                 "import generate_gameboard_slow_and_ineffective as slow; "
+                 "slow._generate_game_board_counted(generate_completed_board(6), np.zeros(0, dtype=np.int64))")
+        for code in ("import lazy_jit; lazy_jit.warm_up()", probe, probe):
+            subprocess.run([sys.executable, "-c", code], env=environment, check=True)
     print(generate_game_board(4))
     print(generate_game_board(6))
     print(generate_game_board(8))
     print(generate_game_board(10))
     print(generate_game_board(12))
+    print(generate_game_board(14))
     average_filled_fraction = sum(filled_fraction(generate_game_board(10)) for _ in range(100))
     print("Average filled fraction: {}".format(average_filled_fraction))
\ No newline at end of file
@@ -0,0 +1,72 @@
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple  # For type hints
+from numba import int_, int64, void
+from lazy_jit import lazy_njit
+from generate_full_board import generate_completed_board_with_stats
+
+# Counters that the clue-removal kernels can maintain, as indices into an int64
+# array passed in by the caller. A zero-length array disables counting: every
+# update is then a single, perfectly predicted branch.
+COUNTER_NAMES = (
+    "removal_iterations",    # Passes of the removal loop (one per blanked cell, plus rejected trials).
+    "rule_checks",           # Cells checked against the rules (rules_count, violation_detected, ...).
+    "score_recomputations",  # Full recomputations of reliance_scores or violation_locations.
+    "rescans",               # Restarts of the candidate scan after a cell is blanked.
+)
+REMOVAL_ITERATIONS, RULE_CHECKS, SCORE_RECOMPUTATIONS, RESCANS = range(len(COUNTER_NAMES))
+
+
+def new_counters(enabled: bool = True) -> np.ndarray:
+    """A zeroed counter array for the removal kernels, empty if counting is disabled."""
+    return np.zeros(len(COUNTER_NAMES) if enabled else 0, dtype=np.int64)
+
+
+@lazy_njit(void(int64[:], int_, int64), cache=True)
+def count(counters: np.ndarray, counter: int, amount: int) -> None:
+    """Adds `amount` to `counters[counter]`, unless counting is disabled."""
+    if counters.shape[0]:
+        counters[counter] += amount
+
+
+@dataclass
+class GenerationStats:
+    """Telemetry of a `generate_game_board(n, stats=True)` call, summed over its attempts."""
+    attempts: int = 0  # Completed boards whose clues were removed.
+    restarts: int = 0  # Abandoned completed-board searches, see generate_full_board.SolveStats.
+    nodes: int = 0  # Completed-board search nodes, see generate_full_board.SolveStats.
+    removal_iterations: int = 0
+    rule_checks: int = 0
+    score_recomputations: int = 0
+    rescans: int = 0
+    completed_board_seconds: float = 0.
+    removal_seconds: float = 0.
+
+    def add_counters(self, counters: np.ndarray) -> None:
+        for name, value in zip(COUNTER_NAMES, counters):
+            setattr(self, name, getattr(self, name) + int(value))
+
+
+def instrumented_attempt(n: int, remove_clues: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                         stats: GenerationStats,
+                         rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generates a completed board from `rng` and removes clues from it with
+    `remove_clues(board, counters)`, adding the telemetry of both stages to `stats`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The puzzle and its completed board.
+    """
+    start = time.perf_counter()
+    completed_board, solve_stats = generate_completed_board_with_stats(n, rng=rng)
+    removal_start = time.perf_counter()
+    counters = new_counters()
+    partial_board = remove_clues(completed_board.copy(), counters)
+    stats.removal_seconds += time.perf_counter() - removal_start
+    stats.completed_board_seconds += removal_start - start
+    stats.attempts += 1
+    stats.restarts += solve_stats.restarts
+    stats.nodes += solve_stats.nodes
+    stats.add_counters(counters)
+    return partial_board, completed_board
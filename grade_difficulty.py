@@ -0,0 +1,220 @@
+import numpy as np
+from typing import Tuple  # For type hints
+from numba import prange, uint8, int_, int64, types
+from lazy_jit import lazy_njit
+
+# Deduction tiers, from easiest to hardest. A puzzle's grade is the hardest tier
+# a human-style solver needs, always preferring the easiest deduction available.
+TIER_NAMES = (
+    "complete",     # 0: nothing to deduce
+    "pairs",        # 1: xx_ and x_x patterns (no three in a row)
+    "counting",     # 2: a line already holds n/2 of one color
+    "duplicates",   # 3: a completion would duplicate another line
+    "lookahead",    # 4: one color leads to a contradiction under tiers 1-3
+    "unsolved",     # 5: the techniques above get stuck (or the puzzle is inconsistent)
+)
+LOOKAHEAD_TIER = 4
+UNSOLVED_TIER = 5
+
+
+# Why a color is excluded from a blank cell, as the rule of tiers 1-3 behind it
+# (tier 1 split into its two patterns) and the line it applies to. Reason codes
+# are 2 * rule + line + 1, so that RULE_NAMES[(code - 1) // 2] is the rule and
+# LINE_NAMES[(code - 1) % 2] the line (row or column); 0 means no rule applies.
+RULE_NAMES = (
+    "pair",       # xx_ or _xx: the cell would make three in a row.
+    "sandwich",   # x_x: likewise, with the cell in the middle.
+    "count",      # The line already holds n/2 cells of the color.
+    "duplicate",  # The line would be decided, and equal to another line.
+)
+LINE_NAMES = ("row", "column")
+RULE_PAIR, RULE_SANDWICH, RULE_COUNT, RULE_DUPLICATE = range(len(RULE_NAMES))
+RULE_TIERS = (1, 1, 2, 3)  # The tier of each rule.
+
+
+@lazy_njit(int_(uint8[:, :], int_, int_, int_), cache=True)
+def exclusion_reason(board: np.ndarray, x: int, y: int, color: int) -> int:
+    """
+    The reason code (see above) of the easiest rule forbidding `color` at the blank
+    cell x, y, or 0 if none does.
+
+    The rules are those of violation_detected.
+    """
+    n_rows, n_columns = board.shape
+    if y > 1 and board[x, y - 2] == color and board[x, y - 1] == color:
+        return 2 * RULE_PAIR + 1
+    if n_columns > y + 2 and board[x, y + 1] == color and board[x, y + 2] == color:
+        return 2 * RULE_PAIR + 1
+    if x > 1 and board[x - 2, y] == color and board[x - 1, y] == color:
+        return 2 * RULE_PAIR + 2
+    if n_rows > x + 2 and board[x + 1, y] == color and board[x + 2, y] == color:
+        return 2 * RULE_PAIR + 2
+    if 0 < y < n_columns - 1 and board[x, y - 1] == color and board[x, y + 1] == color:
+        return 2 * RULE_SANDWICH + 1
+    if 0 < x < n_rows - 1 and board[x - 1, y] == color and board[x + 1, y] == color:
+        return 2 * RULE_SANDWICH + 2
+
+    max_colors_val_for_row = n_columns // 2
+    max_colors_val_for_column = n_rows // 2
+    color_count_in_row = 1
+    for j in range(n_columns):
+        if board[x, j] == color:
+            color_count_in_row += 1
+    if color_count_in_row > max_colors_val_for_row:
+        return 2 * RULE_COUNT + 1
+    color_count_in_column = 1
+    for i in range(n_rows):
+        if board[i, y] == color:
+            color_count_in_column += 1
+    if color_count_in_column > max_colors_val_for_column:
+        return 2 * RULE_COUNT + 2
+
+    # With n/2 cells of `color`, the line is decided; it may not match another line
+    # that holds `color` at all of the same places.
+    if color_count_in_row == max_colors_val_for_row:
+        for k in range(n_rows):
+            if k == x or board[k, y] != color:
+                continue
+            matches = True
+            for j in range(n_columns):
+                if board[x, j] == color and board[k, j] != color:
+                    matches = False
+                    break
+            if matches:
+                return 2 * RULE_DUPLICATE + 1
+    if color_count_in_column == max_colors_val_for_column:
+        for k in range(n_columns):
+            if k == y or board[x, k] != color:
+                continue
+            matches = True
+            for i in range(n_rows):
+                if board[i, y] == color and board[i, k] != color:
+                    matches = False
+                    break
+            if matches:
+                return 2 * RULE_DUPLICATE + 2
+    return 0
+
+
+@lazy_njit(int_(uint8[:, :], int_, int_, int_), cache=True)
+def exclusion_tier(board: np.ndarray, x: int, y: int, color: int) -> int:
+    """The easiest tier whose rule forbids `color` at the blank cell x, y, or 0 if none does."""
+    reason = exclusion_reason(board, x, y, color)
+    if not reason:
+        return 0
+    return RULE_TIERS[(reason - 1) // 2]
+
+
+@lazy_njit(int_(uint8[:, :], int_, int_), cache=True)
+def _apply_deductions(board: np.ndarray, max_tier: int, limit: int) -> int:
+    """
+    Fills in, in place, the blank cells that a rule of tier <= max_tier forces,
+    stopping after `limit` cells (if positive).
+
+    Returns:
+        int: The number of cells filled, or -1 if some blank cell admits neither color.
+    """
+    n_filled = 0
+    for (x, y), val in np.ndenumerate(board):
+        if val:
+            continue
+        tier_1 = exclusion_tier(board, x, y, 1)
+        tier_2 = exclusion_tier(board, x, y, 2)
+        excluded_1 = 0 < tier_1 <= max_tier
+        excluded_2 = 0 < tier_2 <= max_tier
+        if excluded_1 and excluded_2:
+            return -1
+        if excluded_1 or excluded_2:
+            board[x, y] = 2 if excluded_1 else 1
+            n_filled += 1
+            if n_filled == limit:
+                break
+    return n_filled
+
+
+@lazy_njit(types.Tuple((int_, int64))(uint8[:, :]), cache=True)
+def grade_board(partial_board: np.ndarray) -> tuple:
+    """
+    Solves a puzzle like a human would, always using the easiest available technique.
+
+    Returns:
+        Tuple[int, int]: The hardest tier needed (see TIER_NAMES) and the number
+                         of cells deduced.
+    """
+    board = partial_board.copy()
+    hardest = 0
+    steps = 0
+    while np.any(board == 0):
+        progress = 0
+        for tier in range(1, LOOKAHEAD_TIER):
+            # Pairs are applied in sweeps; harder deductions one at a time, so
+            # that easier ones they enable are credited to their own tier.
+            progress = _apply_deductions(board, tier, 0 if tier == 1 else 1)
+            if progress:
+                hardest = max(hardest, tier)
+                break
+        if progress < 0:
+            return UNSOLVED_TIER, steps
+        if not progress:
+            for (x, y), val in np.ndenumerate(board):
+                if val:
+                    continue
+                for color in (1, 2):
+                    trial = board.copy()
+                    trial[x, y] = color
+                    contradiction = False
+                    while True:
+                        filled = _apply_deductions(trial, LOOKAHEAD_TIER - 1, 0)
+                        if filled <= 0:
+                            contradiction = filled < 0
+                            break
+                    if contradiction:
+                        board[x, y] = 3 - color
+                        progress = 1
+                        break
+                if progress:
+                    break
+            if not progress:
+                return UNSOLVED_TIER, steps
+            hardest = LOOKAHEAD_TIER
+        steps += progress
+    return hardest, steps
+
+
+@lazy_njit(types.Tuple((uint8[:], int64[:]))(uint8[:, :, :]), parallel=True, cache=True)
+def grade_boards(partial_boards: np.ndarray) -> tuple:
+    """
+    Grades a (B, n, n) stack of puzzles in parallel.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The tier (uint8) and number of deduced
+                                       cells (int64) of each puzzle.
+    """
+    n_boards = partial_boards.shape[0]
+    tiers = np.zeros(n_boards, dtype=np.uint8)
+    steps = np.zeros(n_boards, dtype=np.int64)
+    for b in prange(n_boards):
+        tier, n_steps = grade_board(partial_boards[b])
+        tiers[b] = tier
+        steps[b] = n_steps
+    return tiers, steps
+
+
+def difficulty_histogram(partial_boards: np.ndarray) -> Tuple[np.ndarray, float]:
+    """The number of puzzles per tier, and the mean number of deduced cells."""
+    tiers, steps = grade_boards(np.ascontiguousarray(partial_boards, dtype=np.uint8))
+    return np.bincount(tiers, minlength=len(TIER_NAMES)), steps.mean()
+
+
+if __name__ == "__main__":
+    import time
+    from generate_gameboard_batch import generate_game_boards
+    boards = generate_game_boards(10, 1000, workers=1, seed=0)
+    grade_boards(boards[:1])
+    start_time = time.perf_counter()
+    histogram, mean_steps = difficulty_histogram(boards)
+    elapsed = time.perf_counter() - start_time
+    print(f"Graded {len(boards)} 10x10 puzzles in {elapsed:.3f}s ({len(boards) / elapsed:.0f}/s), "
+          f"{mean_steps:.1f} deductions on average")
+    for name, count in zip(TIER_NAMES, histogram):
+        print(f"{name:>10}: {count}")
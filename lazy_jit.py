@@ -0,0 +1,90 @@
+import importlib
+from typing import Iterable, List, Tuple  # For type hints
+from numba import njit
+from numba.core.dispatcher import Dispatcher
+
+# Kernels declared with `lazy_njit` and not yet warmed up, with their declared signatures.
+# Some of them may have been compiled already, by their first call.
+_LAZY_KERNELS: List[Tuple[Dispatcher, object]] = []
+
+# The modules whose kernels `warm_up` compiles by default.
+KERNEL_MODULES = (
+    "generate_full_board",
+    "generate_sparse_gameboard",
+    "check_unique",
+    "generate_gameboard_slow_and_ineffective",
+    "grade_difficulty",
+    "board_symmetry",
+    "validate_boards",
+    "hint_engine",
+)
+
+
+def lazy_njit(signature, **options):
+    """
+    Drop-in replacement for `numba.njit(signature, **options)` that defers compilation
+    (or loading from the numba cache) until the kernel is first called, instead of
+    doing it at import time.
+
+    Whether compiled by its first call or by `warm_up`, a kernel is compiled for its
+    declared signature only, and from then on behaves exactly like an eagerly
+    compiled `numba.njit(signature)` kernel: arguments that do not match the
+    signature raise TypeError rather than compiling a new specialisation.
+    """
+    def decorate(func):
+        dispatcher = njit(**options)(func)
+        get_call_template = dispatcher.get_call_template
+
+        # The two ways a dispatcher compiles on demand: called from Python with
+        # arguments it has no specialisation for (the dispatcher then calls the
+        # callable returned here), and typed as the callee of another kernel
+        # being compiled.
+        def compile_for_args(*args, **kws):
+            _compile_declared(dispatcher, signature)
+            return dispatcher
+
+        def get_declared_call_template(args, kws):
+            _compile_declared(dispatcher, signature)
+            return get_call_template(args, kws)
+
+        dispatcher._compile_for_args = compile_for_args
+        dispatcher.get_call_template = get_declared_call_template
+        _LAZY_KERNELS.append((dispatcher, signature))
+        return dispatcher
+    return decorate
+
+
+def _compile_declared(dispatcher: Dispatcher, signature) -> bool:
+    """
+    Compiles `dispatcher` for `signature` and disables any further compilation,
+    unless that was done already.
+
+    Returns:
+        bool: Whether this call compiled the kernel.
+    """
+    if not dispatcher._can_compile:
+        return False
+    dispatcher.compile(signature)
+    dispatcher.disable_compile()
+    return True
+
+
+def warm_up(modules: Iterable[str] = KERNEL_MODULES) -> int:
+    """
+    Imports `modules` and compiles every lazily declared kernel for its declared
+    signature, loading it from the numba cache where possible.
+
+    Call this once at process start (or at image build time, to populate the cache)
+    to take the compilation cost out of the first request.
+
+    Returns:
+        int: The number of kernels compiled by this call (not by an earlier call
+             to the kernel itself).
+    """
+    for module in modules:
+        importlib.import_module(module)
+    # Compiling a kernel also compiles the kernels it calls, so count up front.
+    n_compiled = sum(dispatcher._can_compile for dispatcher, _ in _LAZY_KERNELS)
+    while _LAZY_KERNELS:
+        _compile_declared(*_LAZY_KERNELS.pop())
+    return n_compiled
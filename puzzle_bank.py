@@ -0,0 +1,270 @@
+import os
+import numpy as np
+from typing import Dict, List, Tuple  # For type hints
+from board_symmetry import canonical_hashes, unique_indices
+
+# On-disk layout: one file per board size, "n{n:02d}.tkzb", made of a fixed-size
+# header followed by fixed-size records. Each record stores one (puzzle, solution)
+# pair in 2 bits per cell plus a clue count:
+#   clues:    number of given cells (uint16), so filled_fraction = clues / n**2,
+#   givens:   bit-packed mask of the cells shown in the puzzle,
+#   solution: bit-packed mask of the cells holding color 2 in the solution.
+# Cells are packed in row-major order, least significant bit first.
+# The record count is derived from the file size, so appending never rewrites
+# the header.
+# Next to each bank file, index files "n{n:02d}.{name}" hold one entry per record,
+# in record order, so that queries need not page in the records:
+#   clues:  the clue count of each record (uint16), read by `PuzzleBank.select`,
+#   hashes: the board_symmetry.canonical_hashes of the puzzles (uint64), against
+#           which deduplicated appends check new puzzles.
+# An index that falls behind its bank file (e.g. after an interrupted append, or
+# for hashes, after appends without deduplication) is completed from the records
+# on its next use.
+BANK_MAGIC = b"TKZBANK\0"
+BANK_VERSION = 1
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("n", "<u4"), ("record_size", "<u4")])
+HEADER_SIZE = 64
+INDEX_DTYPES = {"clues": np.dtype("<u2"), "hashes": np.dtype("<u8")}
+_INDEX_CHUNK_SIZE = 1 << 16  # Records decoded at a time while completing an index.
+
+
+def record_dtype(n: int) -> np.dtype:
+    """The dtype of one record of an n x n bank file."""
+    n_bytes = (n * n + 7) // 8
+    return np.dtype([("clues", "<u2"), ("givens", "u1", (n_bytes,)), ("solution", "u1", (n_bytes,))])
+
+
+def pack_boards(puzzles: np.ndarray, solutions: np.ndarray) -> np.ndarray:
+    """
+    Packs a (B, n, n) stack of puzzles and their solutions into bank records.
+
+    Raises:
+        ValueError: If a puzzle contradicts its solution.
+    """
+    puzzles = np.asarray(puzzles, dtype=np.uint8)
+    solutions = np.asarray(solutions, dtype=np.uint8)
+    if puzzles.shape != solutions.shape or puzzles.ndim != 3 or puzzles.shape[1] != puzzles.shape[2]:
+        raise ValueError("puzzles and solutions must be matching (B, n, n) stacks")
+    if np.any((puzzles != 0) & (puzzles != solutions)):
+        raise ValueError("a puzzle contradicts its solution")
+    n_boards, n = puzzles.shape[:2]
+    flat_givens = (puzzles != 0).reshape(n_boards, n * n)
+    records = np.empty(n_boards, dtype=record_dtype(n))
+    records["clues"] = flat_givens.sum(axis=1)
+    records["givens"] = np.packbits(flat_givens, axis=1, bitorder="little")
+    records["solution"] = np.packbits((solutions == 2).reshape(n_boards, n * n), axis=1, bitorder="little")
+    return records
+
+
+def unpack_records(records: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The inverse of `pack_boards`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The (B, n, n) uint8 puzzles and solutions.
+    """
+    records = np.atleast_1d(records)
+    n_boards = len(records)
+    givens = np.unpackbits(records["givens"], axis=1, count=n * n, bitorder="little").reshape(n_boards, n, n)
+    solutions = 1 + np.unpackbits(records["solution"], axis=1, count=n * n,
+                                  bitorder="little").reshape(n_boards, n, n)
+    return solutions * givens, solutions
+
+
+class PuzzleBank:
+    """
+    A directory of memory-mapped, bit-packed puzzle files, one per board size.
+
+    Reads go through np.memmap, so opening a bank costs nothing and a single
+    puzzle can be fetched without loading the rest of the file. The memory map of
+    each size is kept open between reads, until its file changes size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._records: Dict[int, np.ndarray] = {}
+
+    def _file(self, n: int) -> str:
+        return os.path.join(self.path, f"n{n:02d}.tkzb")
+
+    def _index_file(self, n: int, name: str) -> str:
+        return os.path.join(self.path, f"n{n:02d}.{name}")
+
+    def _index_entries(self, name: str, records: np.ndarray, n: int) -> np.ndarray:
+        """The entries of index `name` for some records of size n."""
+        if name == "hashes":
+            return canonical_hashes(unpack_records(records, n)[0])
+        return records["clues"].astype(INDEX_DTYPES[name])
+
+    def _write_index(self, n: int, name: str, start: int, entries: np.ndarray) -> None:
+        """Writes `entries` to index `name` of size n from entry `start` on, dropping any later entries."""
+        path = self._index_file(n, name)
+        offset = start * INDEX_DTYPES[name].itemsize
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(np.ascontiguousarray(entries, dtype=INDEX_DTYPES[name]).tobytes())
+
+    def _index_length(self, n: int, name: str) -> int:
+        try:
+            return os.path.getsize(self._index_file(n, name)) // INDEX_DTYPES[name].itemsize
+        except FileNotFoundError:
+            return 0
+
+    def index(self, n: int, name: str) -> np.ndarray:
+        """
+        A read-only memory map of index `name` (see INDEX_DTYPES) of size n, first
+        completed from the records if it lags behind them.
+        """
+        count = self.count(n)
+        if not count:
+            return np.zeros(0, dtype=INDEX_DTYPES[name])
+        n_indexed = self._index_length(n, name)
+        if n_indexed != count:
+            n_indexed = min(n_indexed, count)
+            records = self.records(n)
+            self._write_index(n, name, n_indexed, np.zeros(0, dtype=INDEX_DTYPES[name]))
+            for start in range(n_indexed, count, _INDEX_CHUNK_SIZE):
+                chunk = records[start:start + _INDEX_CHUNK_SIZE]
+                self._write_index(n, name, start, self._index_entries(name, chunk, n))
+        return np.memmap(self._index_file(n, name), dtype=INDEX_DTYPES[name], mode="r", shape=(count,))
+
+    def sizes(self) -> List[int]:
+        """The board sizes with at least one stored puzzle."""
+        sizes = (int(name[1:-len(".tkzb")]) for name in os.listdir(self.path)
+                 if name.startswith("n") and name.endswith(".tkzb"))
+        return sorted(n for n in sizes if self.count(n))
+
+    def count(self, n: int) -> int:
+        """The number of complete records stored for size n."""
+        try:
+            file_size = os.path.getsize(self._file(n))
+        except FileNotFoundError:
+            return 0
+        return max(file_size - HEADER_SIZE, 0) // record_dtype(n).itemsize
+
+    def __len__(self) -> int:
+        return sum(self.count(n) for n in self.sizes())
+
+    def append(self, puzzles: np.ndarray, solutions: np.ndarray, deduplicate: bool = False) -> int:
+        """
+        Appends a (B, n, n) stack of puzzles and their solutions, e.g. the output of
+        generate_gameboard_batch.generate_game_boards(..., return_solutions=True).
+
+        With deduplicate=True, puzzles that are a symmetry (see board_symmetry) of
+        an earlier puzzle in the stack, or whose canonical hash matches a stored
+        puzzle, are skipped. Stored puzzles are checked through the hash index,
+        without decoding them.
+
+        Returns:
+            int: The number of puzzles appended.
+        """
+        n = puzzles.shape[1]
+        path = self._file(n)
+        if os.path.exists(path):
+            self._check_header(n)
+        else:
+            for name in INDEX_DTYPES:  # Left over from a deleted bank file.
+                if os.path.exists(self._index_file(n, name)):
+                    os.remove(self._index_file(n, name))
+        if deduplicate:
+            keep = unique_indices(puzzles)
+            hashes = canonical_hashes(puzzles[keep])
+            new = ~np.isin(hashes, self.index(n, "hashes"))
+            keep, hashes = keep[new], hashes[new]
+            puzzles, solutions = puzzles[keep], solutions[keep]
+        records = pack_boards(puzzles, solutions)
+        if not os.path.exists(path):
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header[0] = (BANK_MAGIC, BANK_VERSION, n, records.dtype.itemsize)
+            with open(path, "wb") as f:
+                f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+        start = self.count(n)
+        self._records.pop(n, None)
+        with open(path, "r+b") as f:
+            # Drop any partial record left by an interrupted append.
+            f.truncate(HEADER_SIZE + start * records.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+        # Indices that already lag behind are left for `index` to complete.
+        if self._index_length(n, "clues") == start:
+            self._write_index(n, "clues", start, self._index_entries("clues", records, n))
+        if deduplicate and self._index_length(n, "hashes") == start:
+            self._write_index(n, "hashes", start, hashes)
+        return len(records)
+
+    def _check_header(self, n: int) -> None:
+        """
+        Raises:
+            ValueError: If the bank file of size n is not a version BANK_VERSION
+                        file of n x n records.
+        """
+        path = self._file(n)
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if not len(header):
+            raise ValueError(f"{path} is not a puzzle bank file")
+        header = header[0]
+        if header["magic"] != BANK_MAGIC.rstrip(b"\0") or header["version"] != BANK_VERSION:
+            raise ValueError(f"{path} is not a version {BANK_VERSION} puzzle bank file")
+        if header["n"] != n or header["record_size"] != record_dtype(n).itemsize:
+            raise ValueError(f"{path} does not hold {n}x{n} records")
+
+    def records(self, n: int) -> np.ndarray:
+        """A read-only memory map of all records of size n (see `record_dtype`)."""
+        count = self.count(n)
+        cached = self._records.get(n)
+        if cached is not None and len(cached) == count:
+            return cached
+        self._check_header(n)
+        if not count:
+            return np.zeros(0, dtype=record_dtype(n))
+        self._records[n] = np.memmap(self._file(n), dtype=record_dtype(n), mode="r", offset=HEADER_SIZE,
+                                     shape=(count,))
+        return self._records[n]
+
+    def get(self, n: int, index) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decodes the puzzle(s) and solution(s) at `index` (an int, slice or index array).
+        """
+        puzzles, solutions = unpack_records(self.records(n)[index], n)
+        if np.ndim(index) == 0 and not isinstance(index, slice):
+            return puzzles[0], solutions[0]
+        return puzzles, solutions
+
+    def select(self, n: int, min_filled_fraction: float = 0., max_filled_fraction: float = 1.) -> np.ndarray:
+        """
+        The indices of the size-n puzzles whose filled_fraction lies in the given closed
+        range. Only the clue index is read, 2 bytes per puzzle.
+        """
+        clues = self.index(n, "clues")
+        return np.flatnonzero((clues >= min_filled_fraction * n * n) & (clues <= max_filled_fraction * n * n))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from generate_gameboard_batch import generate_game_boards
+    with tempfile.TemporaryDirectory() as bank_path:
+        bank = PuzzleBank(bank_path)
+        for n in (6, 8, 10):
+            bank.append(*generate_game_boards(n, 200, workers=1, seed=n, return_solutions=True))
+        print(f"Sizes {bank.sizes()}, {len(bank)} puzzles, "
+              f"{os.path.getsize(bank._file(10)) / bank.count(10):.1f} bytes per 10x10 puzzle")
+        sparse = bank.select(10, max_filled_fraction=0.3)
+        print(f"{len(sparse)} 10x10 puzzles with filled_fraction <= 0.3, e.g.:")
+        print(bank.get(10, sparse[0])[0])
+        # A bank file deleted by hand, its index files left behind: the next
+        # deduplicated append starts the size afresh.
+        puzzles, solutions = bank.get(8, slice(0, 50))
+        os.remove(bank._file(8))
+        assert bank.append(puzzles, solutions, deduplicate=True) == len(unique_indices(puzzles))
+        assert bank.append(puzzles, solutions, deduplicate=True) == 0
+        assert np.array_equal(bank.index(8, "clues"), np.count_nonzero(bank.get(8, slice(None))[0], axis=(1, 2)))
+        # Appending to a file of another size (or format) is refused.
+        os.replace(bank._file(8), bank._file(6))
+        try:
+            bank.append(*generate_game_boards(6, 1, workers=1, seed=6, return_solutions=True))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("appended to a bank file of 8x8 records as 6x6 records")
@@ -0,0 +1,75 @@
+import numpy as np
+from typing import Optional, Tuple  # For type hints
+from generate_full_board import MAX_N, generate_completed_board, seeded_rng
+from generate_sparse_gameboard import _generate_game_board
+
+# A puzzle ID is a 64-bit integer from which generate_sparse_gameboard rebuilds the
+# puzzle bit for bit, in any process:
+#   bits 56-63: n, the board size,
+#   bits 52-55: the generator version,
+#   bits  0-51: the seed passed to generate_full_board.seeded_rng.
+# PUZZLE_ID_VERSION must be incremented whenever a change to the valid-row order,
+# the completed-board search or the clue-removal kernel changes the puzzle that a
+# seed produces; IDs of other versions are then rejected instead of silently
+# decoding to different puzzles.
+PUZZLE_ID_VERSION = 2
+_SEED_BITS = 52
+_VERSION_BITS = 4
+
+
+def puzzle_id(n: int, seed: int) -> int:
+    """The ID of the n x n puzzle generated from `seed`."""
+    if n <= 0 or n % 2 or n > MAX_N:
+        raise ValueError(f"Board size must be a positive even number up to {MAX_N}, got {n}")
+    if not 0 <= seed < 1 << _SEED_BITS:
+        raise ValueError(f"Seed must lie in [0, 2**{_SEED_BITS}), got {seed}")
+    return (n << (_SEED_BITS + _VERSION_BITS)) | (PUZZLE_ID_VERSION << _SEED_BITS) | seed
+
+
+def parse_puzzle_id(puzzle_id: int) -> Tuple[int, int]:
+    """
+    The inverse of `puzzle_id`.
+
+    Raises:
+        ValueError: If the ID was made by another generator version.
+    """
+    version = (puzzle_id >> _SEED_BITS) & ((1 << _VERSION_BITS) - 1)
+    if version != PUZZLE_ID_VERSION:
+        raise ValueError(f"Puzzle ID {puzzle_id:#x} has generator version {version}, "
+                         f"this code generates version {PUZZLE_ID_VERSION}")
+    return puzzle_id >> (_SEED_BITS + _VERSION_BITS), puzzle_id & ((1 << _SEED_BITS) - 1)
+
+
+def random_puzzle_id(n: int, rng: Optional[np.random.Generator] = None) -> int:
+    """The ID of a random n x n puzzle."""
+    if rng is None:
+        rng = np.random.default_rng()
+    return puzzle_id(n, int(rng.integers(1 << _SEED_BITS, dtype=np.uint64)))
+
+
+def puzzle_from_id(puzzle_id: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rebuilds a puzzle from its ID, the same one that
+    generate_sparse_gameboard.generate_game_board(n, seed=seed) returns.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The puzzle and its solution.
+    """
+    n, seed = parse_puzzle_id(puzzle_id)
+    rng = seeded_rng(seed)
+    solution = generate_completed_board(n, rng=rng)
+    return _generate_game_board(solution.copy()), solution
+
+
+if __name__ == "__main__":
+    example_id = random_puzzle_id(10)
+    puzzle, solution = puzzle_from_id(example_id)
+    print(f"Puzzle {example_id:#018x}:")
+    print(puzzle)
+    assert np.array_equal(puzzle_from_id(example_id)[0], puzzle)
+    for n in (0, 7, MAX_N + 2, 254):
+        try:
+            puzzle_id(n, 0)
+        except ValueError:
+            continue
+        raise AssertionError(f"minted an ID for unsupported size {n}")
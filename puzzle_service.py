@@ -0,0 +1,261 @@
+"""
+Serves puzzles from in-memory queues that worker processes keep topped up.
+
+Usage:
+    python puzzle_service.py [--sizes 6 8 10] [--port 8080] [--low-watermark 64] [--high-watermark 256]
+
+Endpoints:
+    GET /puzzle?n=10   {"n": 10, "puzzle": [[...]], "solution": [[...]]}, 400 unless n is in --sizes
+    GET /stats         The queue levels and number of puzzles served per size.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Iterable, Iterator, Optional, Tuple, Union  # For type hints
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import lazy_jit
+from generate_gameboard_batch import _generate_chunk
+
+
+def _warm_up_worker() -> None:
+    """Runs once in every worker process, so that no request waits for the numba caches to load."""
+    lazy_jit.warm_up()
+
+
+@dataclass
+class _SizeQueue:
+    ready: Deque[Tuple[np.ndarray, np.ndarray]] = field(default_factory=deque)
+    pending: int = 0  # Puzzles submitted to the workers but not yet returned.
+    served: int = 0
+    error: Optional[BaseException] = None
+
+
+class PuzzleStream:
+    """
+    Hands out (puzzle, solution) pairs, generated as by
+    generate_sparse_gameboard.generate_game_board, from a ready queue per board size.
+
+    Whenever the ready plus pending puzzles of a size drop below `low_watermark`,
+    chunks of `chunk_size` puzzles are submitted to the worker processes until they
+    reach `high_watermark`. Only the sizes listed in `sizes` are served, all of them
+    prefetched immediately; requests for other sizes raise a ValueError, so that a
+    client cannot tie up the workers with large boards. With amplify=True, the
+    workers reuse each completed board for its symmetric variants (see
+    generate_gameboard_batch).
+
+    Use as a context manager, or call `close`.
+    """
+
+    def __init__(self, sizes: Iterable[int] = (6, 8, 10), low_watermark: int = 64, high_watermark: int = 256,
+                 workers: Optional[int] = None, chunk_size: int = 16,
+                 seed: Union[None, int, np.random.SeedSequence] = None, amplify: bool = False):
+        if not 0 < low_watermark <= high_watermark:
+            raise ValueError("the watermarks must satisfy 0 < low_watermark <= high_watermark")
+        self.sizes = tuple(sorted(set(sizes)))
+        if not self.sizes:
+            raise ValueError("at least one board size must be served")
+        for n in self.sizes:
+            if n <= 0 or n % 2:
+                raise ValueError(f"Board size must be a positive even number, got {n}")
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.chunk_size = chunk_size
+        self.amplify = amplify
+        self._seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        # Workers are spawned rather than forked, see generate_gameboard_batch.generate_game_boards.
+        self._executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                             initializer=_warm_up_worker,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._condition = threading.Condition()  # Guards the queues; reentrant.
+        self._queues: Dict[int, _SizeQueue] = {}
+        for n in self.sizes:
+            with self._condition:
+                self._refill(n)
+
+    def _refill(self, n: int) -> _SizeQueue:
+        """Returns the queue of size n, submitting chunks if it is below its low watermark."""
+        if n not in self.sizes:
+            raise ValueError(f"Board size {n} is not served, the served sizes are {list(self.sizes)}")
+        queue = self._queues.get(n)
+        if queue is None:
+            queue = self._queues[n] = _SizeQueue()
+        if len(queue.ready) + queue.pending < self.low_watermark:
+            while len(queue.ready) + queue.pending < self.high_watermark:
+                future = self._executor.submit(_generate_chunk, n, self.chunk_size, self._seed.spawn(1)[0],
+                                               self.amplify)
+                queue.pending += self.chunk_size
+                future.add_done_callback(lambda f, n=n: self._on_chunk_done(n, f))
+        return queue
+
+    def _on_chunk_done(self, n: int, future: Future) -> None:
+        with self._condition:
+            queue = self._queues[n]
+            queue.pending -= self.chunk_size
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                queue.error = future.exception()
+            else:
+                puzzles, solutions, _ = future.result()
+                queue.ready.extend(zip(puzzles, solutions))
+            self._condition.notify_all()
+
+    def _pop(self, queue: _SizeQueue) -> Tuple[np.ndarray, np.ndarray]:
+        queue.served += 1
+        return queue.ready.popleft()
+
+    def get_nowait(self, n: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """A ready (puzzle, solution) pair of size n, or None if none is ready."""
+        with self._condition:
+            queue = self._refill(n)
+            if not queue.ready:
+                return None
+            item = self._pop(queue)
+            self._refill(n)
+            return item
+
+    def get(self, n: int, timeout: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A (puzzle, solution) pair of size n, waiting for the workers if none is ready.
+
+        Raises:
+            TimeoutError: If no puzzle became ready within `timeout` seconds.
+        """
+        with self._condition:
+            queue = self._refill(n)
+            if not self._condition.wait_for(lambda: queue.ready or queue.error, timeout):
+                raise TimeoutError(f"No {n}x{n} puzzle became ready within {timeout}s")
+            if not queue.ready:
+                error, queue.error = queue.error, None
+                raise error
+            item = self._pop(queue)
+            self._refill(n)
+            return item
+
+    async def aget(self, n: int, timeout: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """`get`, without blocking the event loop."""
+        item = self.get_nowait(n)
+        if item is None:
+            item = await asyncio.to_thread(self.get, n, timeout)
+        return item
+
+    def stream(self, n: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """An endless iterator over (puzzle, solution) pairs of size n."""
+        while True:
+            yield self.get(n)
+
+    async def astream(self, n: int) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+        """An endless async iterator over (puzzle, solution) pairs of size n."""
+        while True:
+            yield await self.aget(n)
+
+    def stats(self) -> Dict[int, Dict[str, int]]:
+        with self._condition:
+            return {n: {"ready": len(queue.ready), "pending": queue.pending, "served": queue.served}
+                    for n, queue in sorted(self._queues.items())}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "PuzzleStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            503: "Service Unavailable"}
+
+
+def _route(stream: PuzzleStream, method: str, target: str):
+    """Returns the status and JSON body for a request, or a coroutine producing them."""
+    url = urlsplit(target)
+    if method != "GET":
+        return 405, {"error": "only GET is supported"}
+    if url.path == "/stats":
+        return 200, stream.stats()
+    if url.path != "/puzzle":
+        return 404, {"error": f"no such endpoint {url.path}"}
+    try:
+        n = int(parse_qs(url.query).get("n", ["10"])[0])
+        item = stream.get_nowait(n)
+    except ValueError as error:
+        return 400, {"error": str(error)}
+    except BrokenExecutor as error:
+        return 503, {"error": str(error)}
+    if item is not None:
+        return 200, {"n": n, "puzzle": item[0].tolist(), "solution": item[1].tolist()}
+
+    async def wait_for_puzzle():
+        try:
+            puzzle, solution = await stream.aget(n, timeout=30.)
+        except Exception as error:  # A timeout, or a failure in the workers.
+            return 503, {"error": str(error)}
+        return 200, {"n": n, "puzzle": puzzle.tolist(), "solution": solution.tolist()}
+    return wait_for_puzzle()
+
+
+async def _handle_connection(stream: PuzzleStream, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+    """Serves HTTP/1.1 requests, with keep-alive, until the client closes the connection."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+            method, target, version = request_line.decode("latin-1").split()
+            response = _route(stream, method, target)
+            status, body = await response if asyncio.iscoroutine(response) else response
+            payload = json.dumps(body).encode()
+            keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+            writer.write(f"{version} {status} {_REASONS[status]}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(stream: PuzzleStream, host: str = "127.0.0.1", port: int = 8080) -> None:
+    """Serves `stream` over HTTP until cancelled."""
+    server = await asyncio.start_server(lambda reader, writer: _handle_connection(stream, reader, writer),
+                                        host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 8, 10], help="the sizes to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--low-watermark", type=int, default=64)
+    parser.add_argument("--high-watermark", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--amplify", action="store_true", help="reuse completed boards for their symmetric variants")
+    args = parser.parse_args()
+    with PuzzleStream(args.sizes, args.low_watermark, args.high_watermark, args.workers,
+                      args.chunk_size, args.seed, args.amplify) as puzzle_stream:
+        print(f"Serving puzzles of sizes {args.sizes} on http://{args.host}:{args.port}")
+        try:
+            asyncio.run(serve(puzzle_stream, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,105 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional  # For type hints
+import check_unique
+import generate_sparse_gameboard
+import generate_gameboard_slow_and_ineffective
+from generate_full_board import generate_completed_board, seeded_rng
+from generation_stats import GenerationStats, instrumented_attempt, new_counters
+
+
+@dataclass(frozen=True)
+class RemovalStrategy:
+    """
+    A clue-removal strategy: `remove_clues(completed_board, counters)` returns a
+    puzzle made from the completed board, which it may modify, maintaining the
+    generation_stats counters in `counters` (empty to disable counting) as far as
+    it supports them.
+    """
+    name: str
+    remove_clues: Callable[[np.ndarray, np.ndarray], np.ndarray]
+    description: str
+
+
+STRATEGIES: Dict[str, RemovalStrategy] = {}
+DEFAULT_STRATEGY = "reliance"
+
+
+def register_strategy(name: str, remove_clues: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                      description: str) -> RemovalStrategy:
+    """Adds a strategy to STRATEGIES, under a name that must not be taken yet."""
+    if name in STRATEGIES:
+        raise ValueError(f"A removal strategy named {name!r} is already registered")
+    STRATEGIES[name] = RemovalStrategy(name, remove_clues, description)
+    return STRATEGIES[name]
+
+
+def get_strategy(name: str) -> RemovalStrategy:
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown removal strategy {name!r}, expected one of {sorted(STRATEGIES)}")
+    return STRATEGIES[name]
+
+
+def _guided(completed_board: np.ndarray, counters: np.ndarray) -> np.ndarray:
+    n = completed_board.shape[0]
+    return generate_sparse_gameboard._generate_game_board_to_target(completed_board, n * n // 3, 4, 64)
+
+
+register_strategy(
+    "reliance", generate_sparse_gameboard._generate_game_board_counted,
+    "generate_sparse_gameboard: blanks the forced cell whose flip breaks the fewest rules, "
+    "farthest from the last removal.")
+register_strategy(
+    "guided", _guided,
+    "generate_sparse_gameboard: 'reliance', backtracking dead ends above a third of "
+    "the cells (single board, no uniqueness stage).")
+register_strategy(
+    "distance_ordered", check_unique._generate_game_board_counted,
+    "check_unique: blanks forced cells in random order, farthest from the last removal first.")
+register_strategy(
+    "lookahead", generate_gameboard_slow_and_ineffective._generate_game_board_counted,
+    "generate_gameboard_slow_and_ineffective: among the forced cells whose flip breaks the "
+    "fewest rules, blanks the one leaving the most forced cells behind.")
+register_strategy(
+    "min_subsequent_violations",
+    generate_gameboard_slow_and_ineffective._generate_game_board_min_subsequent_violations,
+    "generate_gameboard_slow_and_ineffective: blanks the forced cell leaving the fewest "
+    "forced cells behind, alternating colors at random.")
+register_strategy(
+    "max_ambiguity", generate_gameboard_slow_and_ineffective._generate_game_board_max_ambiguity,
+    "generate_gameboard_slow_and_ineffective: blanks the forced cell leaving the most "
+    "ambiguous cells behind.")
+
+
+def generate_with_remover(n: int, remove_clues: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                          stats: bool = False, seed: Optional[int] = None, max_filled_fraction: float = 1.):
+    """
+    Generates an n x n puzzle by removing clues from a completed board with
+    `remove_clues(completed_board, counters)` (see RemovalStrategy), retrying with a
+    new completed board until at most `max_filled_fraction` of the cells are given,
+    as a deterministic function of `seed` if one is given.
+
+    With stats=True, returns the puzzle together with a GenerationStats, whose
+    `attempts` counts the tries. Otherwise, counting is disabled.
+    """
+    rng = None if seed is None else seeded_rng(seed)
+    generation_stats = GenerationStats()
+    while True:
+        if stats:
+            puzzle = instrumented_attempt(n, remove_clues, generation_stats, rng)[0]
+        else:
+            puzzle = remove_clues(generate_completed_board(n, rng=rng), new_counters(enabled=False))
+        if np.count_nonzero(puzzle) / puzzle.size <= max_filled_fraction:
+            return (puzzle, generation_stats) if stats else puzzle
+
+
+def generate_game_board(n: int, strategy: str = DEFAULT_STRATEGY, stats: bool = False,
+                        seed: Optional[int] = None):
+    """
+    Generates an n x n puzzle with the removal strategy registered as `strategy`, as
+    a deterministic function of `seed` if one is given. With the default strategy,
+    this is generate_sparse_gameboard.generate_game_board.
+
+    With stats=True, returns the puzzle together with a GenerationStats.
+    """
+    return generate_with_remover(n, get_strategy(strategy).remove_clues, stats, seed)
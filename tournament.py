@@ -0,0 +1,92 @@
+"""
+Runs every clue-removal strategy of removal_strategies.STRATEGIES on the same seeded
+completed boards, to compare their speed and the sparsity of their puzzles.
+
+Usage:
+    python tournament.py [--sizes 6 8 10] [--boards 30] [--seed 0]
+                         [--strategies reliance lookahead ...] [--output results.json]
+
+For every strategy and board size, reports the mean and p50 time per puzzle (after
+one untimed call that absorbs compilation), the mean and range of the final
+filled_fraction (lower is sparser), and the fraction of puzzles with a unique
+solution (checked with check_unique.count_solutions up to --max-uniqueness-n).
+Every strategy starts from the same global random state, so the results depend
+only on the seed.
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from typing import List, Optional  # For type hints
+from check_unique import has_unique_solution
+from generate_full_board import generate_completed_board, seeded_rng
+from generation_stats import new_counters
+from removal_strategies import STRATEGIES, get_strategy
+
+TOURNAMENT_FORMAT_VERSION = 1
+
+
+def play_strategy(strategy: str, solutions: List[np.ndarray], seed: int, check_uniqueness: bool) -> dict:
+    """Runs one strategy on every completed board of `solutions`."""
+    remove_clues = get_strategy(strategy).remove_clues
+    remove_clues(solutions[0].copy(), new_counters(enabled=False))
+    seeded_rng(seed)
+    latencies = np.empty(len(solutions))
+    filled_fractions = np.empty(len(solutions))
+    n_unique = 0
+    for i, solution in enumerate(solutions):
+        start = time.perf_counter()
+        puzzle = remove_clues(solution.copy(), new_counters(enabled=False))
+        latencies[i] = time.perf_counter() - start
+        filled_fractions[i] = np.count_nonzero(puzzle) / puzzle.size
+        if check_uniqueness:
+            n_unique += has_unique_solution(puzzle)
+    return {
+        "strategy": strategy,
+        "n": solutions[0].shape[0],
+        "boards": len(solutions),
+        "mean_seconds": float(latencies.mean()),
+        "p50_seconds": float(np.percentile(latencies, 50)),
+        "mean_filled_fraction": float(filled_fractions.mean()),
+        "min_filled_fraction": float(filled_fractions.min()),
+        "max_filled_fraction": float(filled_fractions.max()),
+        "unique_rate": n_unique / len(solutions) if check_uniqueness else None,
+    }
+
+
+def run_tournament(sizes: List[int], boards: int, seed: int, strategies: Optional[List[str]] = None,
+                   max_uniqueness_n: int = 14) -> dict:
+    """Plays every strategy at every size, on `boards` completed boards per size."""
+    results = []
+    for n in sizes:
+        rng = seeded_rng(seed)
+        solutions = [generate_completed_board(n, rng=rng) for _ in range(boards)]
+        for strategy in strategies or STRATEGIES:
+            results.append(play_strategy(strategy, solutions, seed, n <= max_uniqueness_n))
+            print(_format_result(results[-1]), file=sys.stderr)
+    return {"format_version": TOURNAMENT_FORMAT_VERSION, "timestamp": time.time(), "seed": seed,
+            "results": results}
+
+
+def _format_result(result: dict) -> str:
+    unique = "-" if result["unique_rate"] is None else f"{result['unique_rate']:.0%}"
+    return (f"{result['strategy']:>26} n={result['n']:<2}: {1e3 * result['mean_seconds']:10.3f}ms/puzzle "
+            f"(p50 {1e3 * result['p50_seconds']:10.3f}ms), filled {result['mean_filled_fraction']:.3f} "
+            f"[{result['min_filled_fraction']:.3f}, {result['max_filled_fraction']:.3f}], unique {unique:>4}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 8, 10])
+    parser.add_argument("--boards", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES))
+    parser.add_argument("--max-uniqueness-n", type=int, default=14,
+                        help="the largest size at which uniqueness is checked")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+    run = run_tournament(args.sizes, args.boards, args.seed, args.strategies, args.max_uniqueness_n)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=1)
@@ -0,0 +1,143 @@
+import numpy as np
+from typing import Dict, List  # For type hints
+from numba import prange, uint8, int64, bool_
+from lazy_jit import lazy_njit
+
+# Violation codes: a board's code is the bitwise OR of the rules it breaks.
+# Blank cells (0) never violate a rule, so partial boards can be checked too;
+# only complete lines are compared for duplicates.
+VIOLATION_BALANCE = 1  # A line holds more than half of its cells in one color.
+VIOLATION_THREE_IN_A_ROW = 2  # Three adjacent cells of a line share a color.
+VIOLATION_DUPLICATE_ROWS = 4  # Two complete rows are equal.
+VIOLATION_DUPLICATE_COLUMNS = 8  # Two complete columns are equal.
+VIOLATION_INVALID_CELL = 16  # A cell holds something other than 0, 1 or 2.
+VIOLATION_INCOMPLETE = 32  # A cell is blank, while a complete board was required.
+VIOLATION_NAMES = {
+    VIOLATION_BALANCE: "balance",
+    VIOLATION_THREE_IN_A_ROW: "three_in_a_row",
+    VIOLATION_DUPLICATE_ROWS: "duplicate_rows",
+    VIOLATION_DUPLICATE_COLUMNS: "duplicate_columns",
+    VIOLATION_INVALID_CELL: "invalid_cell",
+    VIOLATION_INCOMPLETE: "incomplete",
+}
+MAX_VALIDATED_N = 63
+
+
+@lazy_njit(int64(uint8[:, :], bool_), cache=True)
+def _line_violations(lines: np.ndarray, transposed: bool) -> int:
+    """The violations among the rows of `lines`, reporting duplicates as columns if `transposed`."""
+    n_lines, length = lines.shape
+    code = 0
+    twos = np.zeros(n_lines, dtype=np.int64)
+    complete = np.zeros(n_lines, dtype=np.bool_)
+    for i in range(n_lines):
+        count_1 = 0
+        count_2 = 0
+        for j in range(length):
+            val = lines[i, j]
+            if val == 1:
+                count_1 += 1
+            elif val == 2:
+                count_2 += 1
+                twos[i] |= np.int64(1) << j
+            if j > 1 and val and lines[i, j - 1] == val and lines[i, j - 2] == val:
+                code |= VIOLATION_THREE_IN_A_ROW
+        if 2 * count_1 > length or 2 * count_2 > length:
+            code |= VIOLATION_BALANCE
+        complete[i] = count_1 + count_2 == length
+    for i in range(n_lines):
+        if not complete[i]:
+            continue
+        for k in range(i + 1, n_lines):
+            if complete[k] and twos[i] == twos[k]:
+                code |= VIOLATION_DUPLICATE_COLUMNS if transposed else VIOLATION_DUPLICATE_ROWS
+    return code
+
+
+@lazy_njit(uint8(uint8[:, :], bool_), cache=True)
+def board_violations(board: np.ndarray, require_complete: bool) -> int:
+    """The violation code of a single board (0 if it breaks no rule)."""
+    code = 0
+    for val in board.flat:
+        if val > 2:
+            return VIOLATION_INVALID_CELL
+        if not val and require_complete:
+            code |= VIOLATION_INCOMPLETE
+    return code | _line_violations(board, False) | _line_violations(board.T, True)
+
+
+@lazy_njit(uint8[:](uint8[:, :, :], bool_), parallel=True, cache=True)
+def violation_codes(boards: np.ndarray, require_complete: bool) -> np.ndarray:
+    """The violation code of each board of a (B, n_rows, n_columns) stack, in parallel."""
+    codes = np.zeros(boards.shape[0], dtype=np.uint8)
+    for b in prange(boards.shape[0]):
+        codes[b] = board_violations(boards[b], require_complete)
+    return codes
+
+
+def validate_boards(boards: np.ndarray, require_complete: bool = False) -> np.ndarray:
+    """
+    Checks every board of a (B, n_rows, n_columns) stack against the rules.
+
+    Args:
+        boards (np.ndarray): The boards, complete or partial, with 0 for blank cells.
+        require_complete (bool): Whether blank cells count as a violation.
+
+    Returns:
+        np.ndarray: The uint8 violation code of each board, 0 for valid boards.
+    """
+    boards = np.ascontiguousarray(boards, dtype=np.uint8)
+    if boards.ndim != 3:
+        raise ValueError("boards must be a (B, n_rows, n_columns) stack")
+    if max(boards.shape[1:]) > MAX_VALIDATED_N:
+        raise ValueError(f"Boards larger than {MAX_VALIDATED_N} cells across are not supported")
+    return violation_codes(boards, require_complete)
+
+
+def describe_violations(code: int) -> List[str]:
+    """The names of the violations in a violation code."""
+    return [name for flag, name in VIOLATION_NAMES.items() if code & flag]
+
+
+def violation_counts(codes: np.ndarray) -> Dict[str, int]:
+    """The number of boards with each violation, plus the number of valid boards."""
+    counts = {"valid": int(np.count_nonzero(codes == 0))}
+    for flag, name in VIOLATION_NAMES.items():
+        counts[name] = int(np.count_nonzero(codes & flag))
+    return counts
+
+
+def validate_bank(bank, chunk_size: int = 1 << 20) -> Dict[int, Dict[str, Dict[str, int]]]:
+    """
+    Validates every puzzle and solution stored in a puzzle_bank.PuzzleBank, reading
+    it `chunk_size` records at a time. Solutions must be complete.
+
+    Returns:
+        Dict[int, Dict[str, Dict[str, int]]]: For each board size, the
+                                              `violation_counts` of the puzzles
+                                              and of the solutions.
+    """
+    report = {}
+    for n in bank.sizes():
+        puzzle_codes = []
+        solution_codes = []
+        for start in range(0, bank.count(n), chunk_size):
+            puzzles, solutions = bank.get(n, slice(start, start + chunk_size))
+            puzzle_codes.append(validate_boards(puzzles))
+            solution_codes.append(validate_boards(solutions, require_complete=True))
+        report[n] = {"puzzles": violation_counts(np.concatenate(puzzle_codes)),
+                     "solutions": violation_counts(np.concatenate(solution_codes))}
+    return report
+
+
+if __name__ == "__main__":
+    import time
+    from generate_gameboard_batch import generate_game_boards
+    puzzles, solutions = generate_game_boards(10, 10000, workers=1, seed=0, amplify=True, return_solutions=True)
+    stack = np.concatenate([puzzles, solutions] * 50)
+    validate_boards(stack[:1])
+    start_time = time.perf_counter()
+    codes = validate_boards(stack)
+    elapsed = time.perf_counter() - start_time
+    print(f"Validated {len(stack)} 10x10 boards in {elapsed:.2f}s "
+          f"({60 * len(stack) / elapsed / 1e6:.0f} million per minute): {violation_counts(codes)}")